@@ -0,0 +1,79 @@
+# Compare the chain-batched heterodyne likelihood against vmapping the per-sample likelihood,
+# which is what flowMC does with the posterior(theta) used in the examples.
+
+import time
+import jax
+import jax.numpy as jnp
+from lal import GreenwichMeanSiderealTime
+
+from ripple import ms_to_Mc_eta
+from ripple.waveforms.IMRPhenomD import gen_IMRPhenomD_polar
+from jimgw.PE.detector_preset import *
+from jimgw.PE.detector_projection import make_detector_response
+from jimgw.PE.heterodyneLikelihood import make_heterodyne_likelihood_mutliple_detector, make_heterodyne_likelihood_batched
+from jimgw.PE.generate_noise import generate_noise
+
+n_chains = 1000
+n_repeat = 20
+heterodyne_bins = 1001
+
+f_sampling = 2048
+duration = 128
+fmin = 20
+ifos = ['H1', 'L1', 'V1']
+f_ref = fmin
+trigger_time = 1126259462.4
+post_trigger_duration = 2
+epoch = duration - post_trigger_duration
+gmst = GreenwichMeanSiderealTime(trigger_time)
+
+freqs, psd_dict, noise_dict = generate_noise(1234, f_sampling, duration, fmin, ifos)
+
+Mc, eta = ms_to_Mc_eta(jnp.array([1.5, 1.3]))
+true_param = jnp.array([Mc, eta, 0.01, 0.02, 100., 0., 0., 0.4, 0.3, 1.3, -0.4])
+
+detectors = [get_H1(), get_L1(), get_V1()]
+detector_tensors = jnp.stack([detector[0] for detector in detectors])
+detector_vertices = jnp.stack([detector[1] for detector in detectors])
+response_list = [make_detector_response(detector[0], detector[1]) for detector in detectors]
+
+f_list = freqs[freqs>fmin]
+theta_waveform = true_param[:8].at[5].set(0)
+hp, hc = gen_IMRPhenomD_polar(f_list, theta_waveform, f_ref)
+data_list = []
+psd_list = []
+for ifo, response in zip(ifos, response_list):
+    signal = response(f_list, hp, hc, true_param[9], true_param[10], gmst, true_param[8]) * jnp.exp(-1j*2*jnp.pi*f_list*(epoch+true_param[5]))
+    data_list.append(noise_dict[ifo][freqs>fmin] + signal)
+    psd_list.append(psd_dict[ifo][freqs>fmin])
+
+# Count the waveform calls traced into each likelihood graph.
+waveform_calls = []
+def counted_waveform(f, theta, f_ref):
+    waveform_calls.append(f.shape)
+    return gen_IMRPhenomD_polar(f, theta, f_ref)
+
+logL = make_heterodyne_likelihood_mutliple_detector(list(data_list), list(psd_list), response_list, counted_waveform, true_param, f_list, gmst, epoch, f_ref, heterodyne_bins)
+logL_batched = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, counted_waveform, true_param, f_list, gmst, epoch, f_ref, heterodyne_bins, concatenate_bins=False)
+logL_batched_concatenated = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, counted_waveform, true_param, f_list, gmst, epoch, f_ref, heterodyne_bins, concatenate_bins=True)
+
+params = true_param*(1+1e-4*jax.random.normal(jax.random.PRNGKey(42), shape=(n_chains, len(true_param))))
+
+def benchmark(name, function):
+    waveform_calls.clear()
+    start = time.time()
+    function(params).block_until_ready()
+    compile_time = time.time() - start
+    print("{}: {} waveform call(s) per likelihood evaluation".format(name, len(waveform_calls)))
+    start = time.time()
+    for i in range(n_repeat):
+        output = function(params).block_until_ready()
+    run_time = (time.time() - start)/n_repeat
+    print("{}: compile {:.2f} s, {:.3e} evaluations per second".format(name, compile_time, n_chains/run_time))
+    return output
+
+vmapped_output = benchmark("vmap(logL)", jax.jit(jax.vmap(logL)))
+batched_output = benchmark("batched logL", jax.jit(logL_batched))
+concatenated_output = benchmark("batched logL, concatenated bins", jax.jit(logL_batched_concatenated))
+print("Maximum absolute difference: {:.3e}".format(jnp.max(jnp.abs(vmapped_output - batched_output))))
+print("Maximum absolute difference: {:.3e}".format(jnp.max(jnp.abs(vmapped_output - concatenated_output))))
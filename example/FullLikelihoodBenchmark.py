@@ -0,0 +1,81 @@
+# Compare the full-resolution likelihood written as in the examples, with one projected waveform per detector,
+# against the likelihoods built on the precomputed frequency-domain data, including the polarization-basis one.
+
+import time
+import jax
+import jax.numpy as jnp
+from lal import GreenwichMeanSiderealTime
+
+from ripple import ms_to_Mc_eta
+from ripple.waveforms.IMRPhenomD import gen_IMRPhenomD_polar
+from jimgw.PE.detector_preset import get_detector_array
+from jimgw.PE.detector_projection import make_detector_response
+from jimgw.PE.frequency_domain_data import make_frequency_domain_data, make_full_likelihood, make_polarization_basis_likelihood
+from jimgw.PE.generate_noise import generate_noise
+
+n_chains = 100
+n_repeat = 10
+
+f_sampling = 2048
+duration = 128
+fmin = 20
+ifos = ['H1', 'L1', 'V1']
+f_ref = fmin
+trigger_time = 1126259462.4
+post_trigger_duration = 2
+epoch = duration - post_trigger_duration
+gmst = GreenwichMeanSiderealTime(trigger_time)
+
+freqs, psd_dict, noise_dict = generate_noise(1234, f_sampling, duration, fmin, ifos)
+
+Mc, eta = ms_to_Mc_eta(jnp.array([1.5, 1.3]))
+true_param = jnp.array([Mc, eta, 0.01, 0.02, 100., 0., 0., 0.4, 0.3, 1.3, -0.4])
+
+detector_tensors, detector_vertices = get_detector_array(ifos)
+response_list = [make_detector_response(detector_tensors[i], detector_vertices[i]) for i in range(len(ifos))]
+
+f_list = freqs[freqs>fmin]
+theta_waveform = true_param[:8].at[5].set(0)
+hp, hc = gen_IMRPhenomD_polar(f_list, theta_waveform, f_ref)
+data_list = []
+psd_list = []
+for ifo, response in zip(ifos, response_list):
+    signal = response(f_list, hp, hc, true_param[9], true_param[10], gmst, true_param[8]) * jnp.exp(-1j*2*jnp.pi*f_list*(epoch+true_param[5]))
+    data_list.append(noise_dict[ifo][freqs>fmin] + signal)
+    psd_list.append(psd_dict[ifo][freqs>fmin])
+
+def LogLikelihood(theta):
+    theta_waveform = theta[:8].at[5].set(0)
+    hp_test, hc_test = gen_IMRPhenomD_polar(f_list, theta_waveform, f_ref)
+    align_time = jnp.exp(-1j*2*jnp.pi*f_list*(epoch+theta[5]))
+    df = f_list[1] - f_list[0]
+    output = 0
+    for response, data, psd in zip(response_list, data_list, psd_list):
+        h_test = response(f_list, hp_test, hc_test, theta[9], theta[10], gmst, theta[8]) * align_time
+        match_filter_SNR = 4*jnp.sum((jnp.conj(h_test)*data)/psd*df).real
+        optimal_SNR = 4*jnp.sum((jnp.conj(h_test)*h_test)/psd*df).real
+        output += match_filter_SNR - optimal_SNR/2
+    return output
+
+frequency_domain_data = make_frequency_domain_data(data_list, psd_list, f_list)
+logL_full = make_full_likelihood(frequency_domain_data, detector_tensors, detector_vertices, gen_IMRPhenomD_polar, gmst, epoch, f_ref)
+logL_polarization = make_polarization_basis_likelihood(frequency_domain_data, detector_tensors, detector_vertices, gen_IMRPhenomD_polar, gmst, epoch, f_ref)
+
+params = true_param*(1+1e-4*jax.random.normal(jax.random.PRNGKey(42), shape=(n_chains, len(true_param))))
+
+def benchmark(name, function):
+    start = time.time()
+    function(params).block_until_ready()
+    compile_time = time.time() - start
+    start = time.time()
+    for i in range(n_repeat):
+        output = function(params).block_until_ready()
+    run_time = (time.time() - start)/n_repeat
+    print("{}: compile {:.2f} s, {:.3e} evaluations per second".format(name, compile_time, n_chains/run_time))
+    return output
+
+example_output = benchmark("example LogLikelihood", jax.jit(jax.vmap(LogLikelihood)))
+full_output = benchmark("full likelihood", jax.jit(jax.vmap(logL_full)))
+polarization_output = benchmark("polarization basis likelihood", jax.jit(jax.vmap(logL_polarization)))
+print("Maximum absolute difference: {:.3e}".format(jnp.max(jnp.abs(example_output - full_output))))
+print("Maximum absolute difference: {:.3e}".format(jnp.max(jnp.abs(example_output - polarization_output))))
@@ -0,0 +1,172 @@
+# Run a whole injection campaign in one process.
+#
+# Injection_withParser.py handles one config per process, so every injection pays for the imports, the
+# detector setup and the compilation of the likelihood and of the sampler kernels. Here the configs of a
+# directory are grouped by the settings that fix the array shapes, and every group is compiled once:
+# the heterodyne state of an injection, which holds its data and reference point, is passed to the posterior
+# as a traced argument instead of being closed over, and a single Sampler is reused for the whole group,
+# with its chains, flow and random keys reset between injections.
+#
+# This needs the data-argument API of flowMC, where the posterior is log_pdf(x, data) and the data is given
+# to sample(initial_position, data). It is written for flowMC==0.2.4, unlike the other examples of this folder,
+# which use the older API where the posterior only takes x.
+
+import argparse
+import glob
+import os
+import time
+from importlib.metadata import version
+
+import numpy as np
+import jax
+import jax.numpy as jnp
+import yaml
+from lal import GreenwichMeanSiderealTime
+
+from ripple import ms_to_Mc_eta
+from ripple.waveforms.IMRPhenomD import gen_IMRPhenomD_polar
+from jimgw.PE.detector_preset import get_detector_array
+from jimgw.PE.generate_noise import generate_noise_batch
+from jimgw.PE.heterodyneLikelihood import make_heterodyne_state, make_heterodyne_kernel
+from jimgw.PE.frequency_domain_data import make_frequency_domain_data, make_projected_waveform, match_filter_snr, optimal_snr
+from jimgw.prior import make_uniform_prior, make_composite_prior
+from jimgw.transforms import make_default_transform
+
+if version('flowMC') != '0.2.4':
+    raise ImportError("InjectionCampaign.py needs flowMC==0.2.4 for its data-argument API, found flowMC=={}".format(version('flowMC')))
+
+from flowMC.nfmodel.rqSpline import MaskedCouplingRQSpline
+from flowMC.sampler.MALA import MALA
+from flowMC.sampler.Sampler import Sampler
+from flowMC.utils.PRNG_keys import initialize_rng_keys
+
+parser = argparse.ArgumentParser(description='Injection campaign')
+parser.add_argument('--config_dir', type=str, required=True, help='directory of yaml configs, as written by gen_injection_config.py')
+parser.add_argument('--skip_existing', action='store_true', help='skip the configs whose output already exists')
+args = parser.parse_args()
+
+# Settings that fix the shapes of the arrays or the sampler, configs sharing them share the compiled kernels.
+shared_keys = ['f_sampling', 'duration', 'fmin', 'ifos', 'heterodyne_bins', 'n_dim', 'n_chains', 'n_loop_training',
+               'n_loop_production', 'n_local_steps', 'n_global_steps', 'learning_rate', 'max_samples', 'momentum',
+               'num_epochs', 'batch_size']
+
+f_ref = 30.0
+trigger_time = 1126259462.4
+post_trigger_duration = 2
+gmst = GreenwichMeanSiderealTime(trigger_time)
+
+# Sampling space of the examples: (Mc, q, chi1, chi2, dist_mpc, tc, phic, cos_iota, psi, ra, sin_dec).
+prior_range = jnp.array([[10,50],[0.5,1.0],[-0.5,0.5],[-0.5,0.5],[300,2000],[-0.5,0.5],[0,2*np.pi],[-1,1],[0,np.pi],[0,2*np.pi],[-1,1]])
+prior = make_composite_prior([make_uniform_prior(prior_range)])
+transform = make_default_transform()
+
+
+def run_group(settings, group):
+    """
+    Run all the injections of a group of configs sharing the same settings, compiling the kernels once.
+    """
+    freqs = np.fft.rfftfreq(int(settings['duration']*settings['f_sampling']), 1./settings['f_sampling'])
+    mask = freqs > settings['fmin']
+    f_list = jnp.array(freqs[mask])
+    epoch = settings['duration'] - post_trigger_duration
+    detector_tensors, detector_vertices = get_detector_array(settings['ifos'])
+    n_chains, n_dim = settings['n_chains'], settings['n_dim']
+
+    projected_waveform = jax.jit(make_projected_waveform(detector_tensors, detector_vertices, gen_IMRPhenomD_polar, gmst, epoch, f_ref))
+    heterodyne_kernel = make_heterodyne_kernel(detector_tensors, detector_vertices, gen_IMRPhenomD_polar, gmst, epoch, f_ref)
+
+    @jax.jit
+    def full_log_likelihood(params, frequency_domain_data):
+        h = projected_waveform(frequency_domain_data['frequencies'], params)
+        return match_filter_snr(h, frequency_domain_data).real - optimal_snr(h, frequency_domain_data)/2
+
+    def posterior(x, data):
+        return heterodyne_kernel(transform['forward'](x), data['state']) + prior['log_prob'](x)
+
+    def make_injection(config):
+        # A batch of one seed keeps the shapes of the jitted noise draw fixed, and noise matches generate_noise(seed+1234).
+        _, psd, noise = generate_noise_batch([config['seed']+1234], settings['f_sampling'], settings['duration'], settings['fmin'], settings['ifos'])
+        Mc, eta = ms_to_Mc_eta(jnp.array([config['m1'], config['m2']]))
+        true_param = jnp.array([Mc, eta, config['chi1'], config['chi2'], config['dist_mpc'], config['tc'], config['phic'],
+                                config['inclination'], config['polarization_angle'], config['ra'], config['dec']])
+        data = noise[0][:, mask] + projected_waveform(f_list, true_param)
+        data_list, psd_list = list(data), list(psd[:, mask])
+        # The injected parameters are the reference point, as in Injection_withParser.py.
+        state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, gen_IMRPhenomD_polar, true_param, f_list, gmst, epoch, f_ref, settings['heterodyne_bins'])
+        frequency_domain_data = make_frequency_domain_data(data_list, psd_list, f_list)
+        return true_param, {'state': state}, frequency_domain_data
+
+    # The step size is compiled into the MALA kernel, so it is set once per group from the first injection,
+    # and is not autotuned per injection as in Injection_withParser.py.
+    first_injection = make_injection(group[0])
+    first_param, first_data, _ = first_injection
+    mass_matrix = jnp.diag(jnp.abs(1./jax.grad(posterior)(transform['inverse'](first_param), first_data)))
+    local_sampler = MALA(posterior, True, {"step_size": mass_matrix*3e-3})
+    model = MaskedCouplingRQSpline(n_dim, 10, [128,128], 8, jax.random.PRNGKey(group[0]['seed']))
+
+    nf_sampler = Sampler(
+        n_dim,
+        initialize_rng_keys(n_chains, seed=group[0]['seed']),
+        first_data,
+        local_sampler,
+        model,
+        n_loop_training=settings['n_loop_training'],
+        n_loop_production=settings['n_loop_production'],
+        n_local_steps=settings['n_local_steps'],
+        n_global_steps=settings['n_global_steps'],
+        n_chains=n_chains,
+        n_epochs=settings['num_epochs'],
+        learning_rate=settings['learning_rate'],
+        max_samples=settings['max_samples'],
+        momentum=settings['momentum'],
+        batch_size=settings['batch_size'],
+        use_global=True,
+        keep_quantile=0.,
+        train_thinning=40,
+    )
+    initial_optim_state = nf_sampler.optim_state
+
+    for i, config in enumerate(group):
+        start = time.time()
+        true_param, data, frequency_domain_data = first_injection if i == 0 else make_injection(config)
+        true_param_trans = transform['inverse'](true_param)
+        seed = config['seed']
+
+        rng_key_set = initialize_rng_keys(n_chains, seed=seed)
+        guess_param = true_param_trans*(1+0.1*jax.random.normal(jax.random.PRNGKey(seed+98127), shape=(n_chains, n_dim)))
+        initial_position = prior['sample'](rng_key_set[0], n_chains)
+        initial_position = jnp.stack([guess_param[:, 0]] + [initial_position[:, i] for i in range(1, 5)] + [guess_param[:, 5]]
+                                     + [initial_position[:, i] for i in range(6, n_dim)], axis=-1)
+
+        # Start every injection from an untrained flow, with fresh chains and random keys.
+        nf_sampler.reset()
+        nf_sampler.global_sampler.model = model
+        nf_sampler.optim_state = initial_optim_state
+        _, nf_sampler.rng_keys_mcmc, nf_sampler.rng_keys_nf, _ = rng_key_set
+        nf_sampler.sample(initial_position, data)
+
+        chains, log_prob, local_accs, global_accs, loss_vals = nf_sampler.get_sampler_state(training=True).values()
+        chains, log_prob, local_accs, global_accs = nf_sampler.get_sampler_state().values()
+        downsample_factor = config.get('downsample_factor', 1)
+        np.savez(config['output_path'], chains=chains[:,::downsample_factor], log_prob=log_prob[:,::downsample_factor],
+                 local_accs=local_accs[:,::downsample_factor], global_accs=global_accs[:,::downsample_factor], loss_vals=loss_vals,
+                 labels=transform['sampling_names'], true_param=true_param, true_log_prob=full_log_likelihood(true_param, frequency_domain_data))
+        print("Finished {} in {:.1f} s".format(config['output_path'], time.time() - start))
+
+
+configs = []
+for path in sorted(glob.glob(os.path.join(args.config_dir, '*.yaml'))):
+    config = yaml.load(open(path, 'r'), Loader=yaml.FullLoader)
+    if args.skip_existing and os.path.exists(config['output_path'] + '.npz'):
+        continue
+    configs.append(config)
+
+groups = {}
+for config in configs:
+    key = tuple((key, tuple(config[key]) if key == 'ifos' else config[key]) for key in shared_keys)
+    groups.setdefault(key, []).append(config)
+
+print("Running {} injections in {} group(s)".format(len(configs), len(groups)))
+
+for key, group in groups.items():
+    run_group(dict(key), group)
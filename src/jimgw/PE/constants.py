@@ -9,3 +9,4 @@ euler_gamma = 0.577215664901532860606512090082
 MR_sun = 1.476625061404649406193430731479084713e3
 speed_of_light = 299792458.0
 
+earth_angular_velocity = 7.292115855e-5 # Sidereal rotation rate of the Earth in rad/s
@@ -5,6 +5,144 @@ import jax.numpy as jnp
 
 degree_to_radian = jnp.pi/180
 
+# Geometry of the detectors. Angles are in degrees except for the arm tilts, which are in radians,
+# and the elevation is in meters. The arm azimuths are measured counterclockwise from East, following bilby.
+detector_parameters = {
+	'H1': {
+		'latitude': 46 + 27. / 60 + 18.528 / 3600,
+		'longitude': -(119 + 24. / 60 + 27.5657 / 3600),
+		'xarm_azimuth': 125.9994,
+		'yarm_azimuth': 215.9994,
+		'xarm_tilt': -6.195e-4,
+		'yarm_tilt': 1.25e-5,
+		'elevation': 142.554,
+	},
+	'L1': {
+		'latitude': 30 + 33. / 60 + 46.4196 / 3600,
+		'longitude': -(90 + 46. / 60 + 27.2654 / 3600),
+		'xarm_azimuth': 197.7165,
+		'yarm_azimuth': 287.7165,
+		'xarm_tilt': 0.,
+		'yarm_tilt': 0.,
+		'elevation': -6.574,
+	},
+	'V1': {
+		'latitude': 43 + 37. / 60 + 53.0921 / 3600,
+		'longitude': 10 + 30. / 60 + 16.1878 / 3600,
+		'xarm_azimuth': 70.5674,
+		'yarm_azimuth': 160.5674,
+		'xarm_tilt': 0.,
+		'yarm_tilt': 0.,
+		'elevation': 51.884,
+	},
+	'K1': {
+		'latitude': 36 + 24. / 60 + 42.69722 / 3600,
+		'longitude': 137 + 18. / 60 + 21.44171 / 3600,
+		'xarm_azimuth': 90 - 60.39623,
+		'yarm_azimuth': 90 + 29.60357,
+		'xarm_tilt': 0.0031414,
+		'yarm_tilt': -0.003627,
+		'elevation': 414.181,
+	},
+	# The three interferometers of the Einstein Telescope, following LIGO-T1400308.
+	'E1': {
+		'latitude': 43.631414472,
+		'longitude': 10.504496611,
+		'xarm_azimuth': 90 - 19.432600236,
+		'yarm_azimuth': 90 - 319.432593216,
+		'xarm_tilt': 0.,
+		'yarm_tilt': 0.,
+		'elevation': 51.884,
+	},
+	'E2': {
+		'latitude': 43.716283276,
+		'longitude': 10.545780316,
+		'xarm_azimuth': 90 - 259.461128077,
+		'yarm_azimuth': 90 - 199.461112747,
+		'xarm_tilt': -7.836216e-4,
+		'yarm_tilt': -1.5702446e-3,
+		'elevation': 59.735,
+	},
+	'E3': {
+		'latitude': 43.699756461,
+		'longitude': 10.423819293,
+		'xarm_azimuth': 90 - 139.376894845,
+		'yarm_azimuth': 90 - 79.376865854,
+		'xarm_tilt': -1.5685210e-3,
+		'yarm_tilt': -7.818981e-4,
+		'elevation': 59.727,
+	},
+	# Cosmic Explorer at the Hanford site, as in bilby.
+	'CE': {
+		'latitude': 46 + 27. / 60 + 18.528 / 3600,
+		'longitude': -(119 + 24. / 60 + 27.5657 / 3600),
+		'xarm_azimuth': 125.9994,
+		'yarm_azimuth': 215.9994,
+		'xarm_tilt': -6.195e-4,
+		'yarm_tilt': 1.25e-5,
+		'elevation': 142.554,
+	},
+}
+
+# Detector tensors and vertices computed so far, keyed by detector name or by tuple of names.
+_detector_cache = {}
+
+def add_detector(name, latitude, longitude, xarm_azimuth, yarm_azimuth, xarm_tilt=0., yarm_tilt=0., elevation=0.):
+	"""
+	Add a detector to the registry, or replace an existing one.
+	The arguments follow the units of detector_parameters.
+	"""
+	detector_parameters[name] = {
+		'latitude': latitude,
+		'longitude': longitude,
+		'xarm_azimuth': xarm_azimuth,
+		'yarm_azimuth': yarm_azimuth,
+		'xarm_tilt': xarm_tilt,
+		'yarm_tilt': yarm_tilt,
+		'elevation': elevation,
+	}
+	_detector_cache.clear()
+
+def get_detector(name):
+	"""
+	Get the detector tensor and the vertex position of a detector in the registry.
+	They are computed on the first call and cached.
+
+	Returns
+	-------
+	detector_tensor : ndarray
+		The detector response matrix, shape (3, 3).
+	vertex : ndarray
+		The vertex position, shape (3,).
+	"""
+	if name not in _detector_cache:
+		parameters = detector_parameters[name]
+		latitude = parameters['latitude'] * degree_to_radian
+		longitude = parameters['longitude'] * degree_to_radian
+		arm1 = construct_arm(latitude, longitude, parameters['xarm_tilt'], parameters['xarm_azimuth'] * degree_to_radian)
+		arm2 = construct_arm(latitude, longitude, parameters['yarm_tilt'], parameters['yarm_azimuth'] * degree_to_radian)
+		vertex = get_vertex_position_geocentric(latitude, longitude, parameters['elevation'])
+		_detector_cache[name] = (detector_tensor(arm1, arm2), vertex)
+	return _detector_cache[name]
+
+def get_detector_array(names):
+	"""
+	Get the detector tensors and vertex positions of several detectors stacked along a leading axis,
+	in the format used by make_stacked_detector_response.
+
+	Returns
+	-------
+	detector_tensors : ndarray
+		The detector response matrices, shape (n_det, 3, 3).
+	vertices : ndarray
+		The vertex positions, shape (n_det, 3).
+	"""
+	names = tuple(names)
+	if names not in _detector_cache:
+		detectors = [get_detector(name) for name in names]
+		_detector_cache[names] = (jnp.stack([detector[0] for detector in detectors]), jnp.stack([detector[1] for detector in detectors]))
+	return _detector_cache[names]
+
 def get_H1():
 	"""
 	Get the detector response matrix and the vertex position for H1.
@@ -16,20 +154,7 @@ def get_H1():
 	H1_vertex : ndarray
 		The vertex position for H1.
 	"""
-	H1_lat = (46 + 27. / 60 + 18.528 / 3600) * degree_to_radian
-	H1_long = -(119 + 24. / 60 + 27.5657 / 3600) * degree_to_radian
-	H1_xarm_azimuth = 125.9994 * degree_to_radian
-	H1_yarm_azimuth = 215.9994 * degree_to_radian
-	H1_xarm_tilt = -6.195e-4
-	H1_yarm_tilt = 1.25e-5
-	H1_elevation = 142.554
-	
-	H1_arm1 = construct_arm(H1_lat, H1_long, H1_xarm_tilt, H1_xarm_azimuth)
-	H1_arm2 = construct_arm(H1_lat, H1_long, H1_yarm_tilt, H1_yarm_azimuth)
-
-	H1_vertex = get_vertex_position_geocentric(H1_lat, H1_long, H1_elevation)
-	
-	return detector_tensor(H1_arm1, H1_arm2), H1_vertex
+	return get_detector('H1')
 
 def get_L1():
 	"""
@@ -43,20 +168,7 @@ def get_L1():
 		The vertex position for L1.
 		
 	"""
-	L1_lat = (30 + 33. / 60 + 46.4196 / 3600) * degree_to_radian
-	L1_long = -(90 + 46. / 60 + 27.2654 / 3600) * degree_to_radian
-	L1_xarm_azimuth = 197.7165 * degree_to_radian
-	L1_yarm_azimuth = 287.7165 * degree_to_radian
-	L1_xarm_tilt = 0 
-	L1_yarm_tilt = 0
-	L1_elevation = -6.574
-	
-	L1_arm1 = construct_arm(L1_lat, L1_long, L1_xarm_tilt, L1_xarm_azimuth)
-	L1_arm2 = construct_arm(L1_lat, L1_long, L1_yarm_tilt, L1_yarm_azimuth)
-
-	L1_vertex = get_vertex_position_geocentric(L1_lat, L1_long, L1_elevation)
-	
-	return detector_tensor(L1_arm1, L1_arm2), L1_vertex
+	return get_detector('L1')
 
 def get_V1():
 	"""
@@ -69,17 +181,4 @@ def get_V1():
 	V1_vertex : ndarray
 		The vertex position for V1.
 	"""
-	V1_lat = (43 + 37. / 60 + 53.0921 / 3600) * degree_to_radian
-	V1_long = (10 + 30. / 60 + 16.1878 / 3600) * degree_to_radian
-	V1_xarm_azimuth = 70.5674 * degree_to_radian
-	V1_yarm_azimuth = 160.5674 * degree_to_radian
-	V1_xarm_tilt = 0
-	V1_yarm_tilt = 0
-	V1_elevation = 51.884
-	
-	V1_arm1 = construct_arm(V1_lat, V1_long, V1_xarm_tilt, V1_xarm_azimuth)
-	V1_arm2 = construct_arm(V1_lat, V1_long, V1_yarm_tilt, V1_yarm_azimuth)
-
-	V1_vertex = get_vertex_position_geocentric(V1_lat, V1_long, V1_elevation)
-	
-	return detector_tensor(V1_arm1, V1_arm2), V1_vertex
+	return get_detector('V1')
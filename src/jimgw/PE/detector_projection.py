@@ -1,5 +1,6 @@
 # Credit some part of the source code from bilby
 
+import jax
 import jax.numpy as jnp
 from jimgw.PE.constants import *
 
@@ -13,7 +14,99 @@ def make_detector_response(detector_tensor, detector_vertex):
         output = output * jnp.exp(-1j * 2 * jnp.pi * f * timeshift)
         return output
     return detector_response
-        
+
+def make_stacked_detector_response(detector_tensors, detector_vertices):
+    """
+    Same as make_detector_response, but for a stack of detectors.
+
+    Args:
+        detector_tensors: Detector tensors, shape (n_det, 3, 3).
+        detector_vertices: Detector vertices, shape (n_det, 3).
+
+    Returns:
+        A function with the same signature as the one returned by make_detector_response,
+        which returns the projected waveform in every detector with shape (n_det, len(f)).
+    """
+    def detector_response(f, hp, hc, ra, dec, gmst, psi):
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        timeshift = time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+        output = antenna_plus[:, None]*hp + antenna_cross[:, None]*hc
+        output = output * jnp.exp(-1j * 2 * jnp.pi * f * timeshift[:, None])
+        return output
+    return detector_response
+
+def make_rotating_detector_response(detector_tensors, detector_vertices):
+    """
+    Same as make_stacked_detector_response, but accounts for the rotation of the Earth during the signal.
+    The antenna patterns and time delays are evaluated at the sidereal time at which every frequency
+    is emitted, gmst - earth_angular_velocity * tau(f), where tau(f) is the time to merger,
+    e.g. from jimgw.PE.utils.time_to_merger.
+
+    Returns:
+        A function detector_response(f, hp, hc, ra, dec, gmst, psi, tau), where gmst is the sidereal time
+        at merger and tau has the shape of f, which returns the projected waveform with shape (n_det, len(f)).
+    """
+    def antenna_and_delay(ra, dec, gmst, psi):
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        return antenna_plus, antenna_cross, time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+
+    antenna_and_delay_rotating = jax.vmap(antenna_and_delay, in_axes=(None, None, 0, None), out_axes=-1)
+
+    def detector_response(f, hp, hc, ra, dec, gmst, psi, tau):
+        antenna_plus, antenna_cross, timeshift = antenna_and_delay_rotating(ra, dec, gmst - earth_angular_velocity*tau, psi)
+        output = antenna_plus*hp + antenna_cross*hc
+        output = output * jnp.exp(-1j * 2 * jnp.pi * f * timeshift)
+        return output
+    return detector_response
+
+def antenna_pattern(detector_tensors, ra, dec, gmst, psi):
+    """
+    Compute the plus and cross antenna patterns of a stack of detectors in one pass.
+    The polarization basis is computed once and contracted with every detector tensor.
+    Works under vmap over (ra, dec, gmst, psi).
+
+    Args:
+        detector_tensors: Detector tensors, shape (n_det, 3, 3).
+        ra: Right ascension in radian.
+        dec: Declination in radian.
+        gmst: Greenwich mean sidereal time in radian.
+        psi: Polarization angle in radian.
+
+    Returns:
+        A tuple of F+ and Fx, each with shape (n_det,).
+    """
+    gmst = jnp.mod(gmst, 2 * jnp.pi)
+    phi = ra - gmst
+    theta = jnp.pi / 2 - dec
+
+    u = jnp.array([jnp.cos(phi) * jnp.cos(theta), jnp.cos(theta) * jnp.sin(phi), -jnp.sin(theta)])
+    v = jnp.array([-jnp.sin(phi), jnp.cos(phi), 0])
+    m = -u * jnp.sin(psi) - v * jnp.cos(psi)
+    n = -u * jnp.cos(psi) + v * jnp.sin(psi)
+
+    # D:(m m - n n) and D:(m n + n m) without building the polarization tensors.
+    Dm = jnp.einsum('dij,j->di', detector_tensors, m)
+    Dn = jnp.einsum('dij,j->di', detector_tensors, n)
+    antenna_plus = Dm @ m - Dn @ n
+    antenna_cross = Dm @ n + Dn @ m
+    return antenna_plus, antenna_cross
+
+def time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst):
+    """
+    Time delay from the geocenter to a stack of detectors, same as time_delay_geocentric(vertex, 0, ra, dec, gmst) for every vertex.
+
+    Args:
+        detector_vertices: Detector vertices, shape (n_det, 3).
+
+    Returns:
+        Time delays with shape (n_det,).
+    """
+    gmst = jnp.mod(gmst, 2 * jnp.pi)
+    phi = ra - gmst
+    theta = jnp.pi / 2 - dec
+    omega = jnp.array([jnp.sin(theta) * jnp.cos(phi), jnp.sin(theta) * jnp.sin(phi), jnp.cos(theta)])
+    return -(detector_vertices @ omega) / speed_of_light
+
 ##########################################################
 # Construction of arms
 ##########################################################
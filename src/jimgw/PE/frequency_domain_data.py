@@ -0,0 +1,128 @@
+import jax
+import jax.numpy as jnp
+
+from jimgw.PE.detector_projection import antenna_pattern, time_delay_geocentric_stacked
+from jimgw.PE.utils import quadrature_weights
+
+def make_frequency_domain_data(data_list, psd_list, frequencies, quadrature=None):
+    """
+    Store the data of a stack of detectors with its noise weights, computed once per event.
+
+    Args:
+        data_list: List of frequency domain data, one per detector.
+        psd_list: List of PSDs, one per detector.
+        frequencies: Frequency grid of the data.
+        quadrature: Quadrature weights of the frequency samples. If None, they are computed with
+            jimgw.PE.utils.quadrature_weights with its default midpoint rule, which is df on a uniform grid.
+            jimgw.PE.utils.inner_product uses the trapezoidal rule unless it is given the same weights.
+
+    Returns:
+        A dictionary with the 'frequencies', the 'data', the 'weights' 4 df/S and the 'weighted_data' 4 df d/S,
+        the last three with shape (n_det, n_freq). It can be passed through jit and vmap like any array.
+    """
+    frequencies = jnp.asarray(frequencies)
+    if quadrature is None:
+        quadrature = quadrature_weights(frequencies)
+    data = jnp.stack(data_list)
+    weights = 4*quadrature/jnp.stack(psd_list)
+    return {
+        'frequencies': frequencies,
+        'data': data,
+        'weights': weights,
+        'weighted_data': data*weights,
+    }
+
+def match_filter_snr(h, frequency_domain_data):
+    """
+    Complex matched filter <d|h> summed over detectors, whose real part enters the likelihood.
+
+    Args:
+        h: Projected waveform with shape (n_det, n_freq).
+        frequency_domain_data: Output of make_frequency_domain_data.
+    """
+    return jnp.sum(jnp.conj(h)*frequency_domain_data['weighted_data'])
+
+def optimal_snr(h, frequency_domain_data):
+    """
+    Optimal SNR <h|h> summed over detectors.
+
+    Args:
+        h: Projected waveform with shape (n_det, n_freq).
+        frequency_domain_data: Output of make_frequency_domain_data.
+    """
+    return jnp.sum(frequency_domain_data['weights']*(h.real**2 + h.imag**2))
+
+def make_projected_waveform(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref):
+    """
+    Make the waveform projected onto a stack of detectors, including the time shift to epoch + tc.
+
+    Returns:
+        A function projected_waveform(f, params) returning an array with shape (n_det, len(f)).
+    """
+    def projected_waveform(f, params):
+        theta_waveform = jnp.where(jnp.arange(params.shape[-1]) == 5, 0., params)
+        hp, hc = h_function(f, theta_waveform, f_ref)
+        ra, dec, psi = params[9], params[10], params[8]
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        time = epoch + params[5] + time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+        return (antenna_plus[:, None]*hp + antenna_cross[:, None]*hc)*jnp.exp(-1j*2*jnp.pi*f*time[:, None])
+
+    return projected_waveform
+
+def make_full_likelihood(frequency_domain_data, detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref):
+    """
+    Full-resolution log-likelihood of a stack of detectors, with no division in the hot path.
+
+    Args:
+        frequency_domain_data: Output of make_frequency_domain_data.
+        detector_tensors: Detector tensors, shape (n_det, 3, 3).
+        detector_vertices: Detector vertices, shape (n_det, 3).
+        h_function: Waveform model returning hp, hc given (f, theta, f_ref).
+        gmst: Greenwich mean sidereal time.
+        epoch: Epoch of the data segment.
+        f_ref: Reference frequency of the waveform.
+
+    Returns:
+        A jitted function full_likelihood(params).
+    """
+    projected_waveform = make_projected_waveform(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+
+    @jax.jit
+    def full_likelihood(params):
+        h = projected_waveform(frequency_domain_data['frequencies'], params)
+        return match_filter_snr(h, frequency_domain_data).real - optimal_snr(h, frequency_domain_data)/2
+
+    return full_likelihood
+
+def make_polarization_basis_likelihood(frequency_domain_data, detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref):
+    """
+    Same as make_full_likelihood, but the optimal SNR is assembled in the polarization basis.
+
+    The time shifts have unit modulus, so <h|h> of every detector only depends on the sky position and
+    polarization through the antenna patterns: F+^2 <hp|hp> + Fx^2 <hc|hc> + 2 F+ Fx Re<hp|hc>. The three
+    weighted sums are computed for all detectors with one matrix product, and the projected waveform is
+    never built. The dense per-detector work reduces to the time-shifted matched filter against hp and hc.
+
+    Returns:
+        A jitted function polarization_basis_likelihood(params).
+    """
+    frequencies = frequency_domain_data['frequencies']
+
+    @jax.jit
+    def polarization_basis_likelihood(params):
+        theta_waveform = jnp.where(jnp.arange(params.shape[-1]) == 5, 0., params)
+        hp, hc = h_function(frequencies, theta_waveform, f_ref)
+        ra, dec, psi = params[9], params[10], params[8]
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        time = epoch + params[5] + time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+
+        shifted_data = frequency_domain_data['weighted_data']*jnp.exp(1j*2*jnp.pi*frequencies*time[:, None])
+        overlap = shifted_data @ jnp.conj(jnp.stack([hp, hc], axis=-1))
+        match_filter_SNR = jnp.sum(antenna_plus*overlap[:, 0] + antenna_cross*overlap[:, 1]).real
+
+        polarization_products = jnp.stack([hp.real**2 + hp.imag**2, hc.real**2 + hc.imag**2, (jnp.conj(hp)*hc).real], axis=-1)
+        gram = frequency_domain_data['weights'] @ polarization_products
+        optimal_SNR = jnp.sum(antenna_plus**2*gram[:, 0] + antenna_cross**2*gram[:, 1] + 2*antenna_plus*antenna_cross*gram[:, 2])
+        return match_filter_SNR - optimal_SNR/2
+
+    return polarization_basis_likelihood
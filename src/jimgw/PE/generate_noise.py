@@ -1,5 +1,8 @@
 # Import packages
-from typing import List, Tuple
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import lal
 import lalsimulation as lalsim 
 import jax.numpy as jnp
 import jax
@@ -12,32 +15,104 @@ psd_func_dict = {
     'V1': lalsim.SimNoisePSDAdvVirgo,
 }
 
-def generate_noise(seed: int, f_sampling: int = 2048, duration: int = 4, f_min: float = 30., ifos: List = ['H1', 'L1']):
-
-
-    # define sampling rate and duration
+# Pointer versions of the functions above, used by lalsim.SimNoisePSD to fill a whole frequency series at once.
+psd_ptr_dict = {
+    'H1': lalsim.SimNoisePSDaLIGOZeroDetHighPowerPtr,
+    'L1': lalsim.SimNoisePSDaLIGOZeroDetHighPowerPtr,
+    'V1': lalsim.SimNoisePSDAdvVirgoPtr,
+}
 
+def get_frequencies(f_sampling: int, duration: int) -> np.ndarray:
     delta_t = 1/f_sampling
     tlen = int(round(duration / delta_t))
+    return np.fft.rfftfreq(tlen, delta_t)
 
-    freqs = np.fft.rfftfreq(tlen, delta_t)
-    delta_f = freqs[1] - freqs[0]
+def compute_psd(ifo: str, f_sampling: int = 2048, duration: int = 4, f_min: float = 30.) -> np.ndarray:
+    """
+    Evaluate the design PSD of a detector on the rfft frequency grid of a segment.
 
+    The analytic curve is evaluated on the whole grid with a single call to lalsim.SimNoisePSD,
+    instead of one Python call per frequency.
+    Below f_min the PSD is padded smoothly from its value at f_min.
+
+    Args:
+        ifo: Name of the detector, a key of psd_func_dict.
+        f_sampling: Sampling frequency in Hz.
+        duration: Duration of the segment in seconds.
+        f_min: Minimum frequency in Hz.
+
+    Returns:
+        The PSD on np.fft.rfftfreq(duration*f_sampling, 1/f_sampling).
+    """
+    freqs = get_frequencies(f_sampling, duration)
+    series = lal.CreateREAL8FrequencySeries('psd', lal.LIGOTimeGPS(0), freqs[0], freqs[1] - freqs[0], lal.DimensionlessUnit, len(freqs))
+    lalsim.SimNoisePSD(series, f_min, psd_ptr_dict[ifo])
+    psd = np.array(series.data.data)
+    # SimNoisePSD leaves the Nyquist bin empty.
+    psd[-1] = psd_func_dict[ifo](freqs[-1])
     # we will want to pad low frequencies; the function below applies a
     # prescription to do so smoothly, but this is not really needed: you
     # could just set all values below `fmin` to a constant.
-    def pad_low_freqs(f, psd_ref):
-        return psd_ref + psd_ref*(f_min-f)*jnp.exp(-(f_min-f))/3
+    psd_ref = psd_func_dict[ifo](f_min)
+    low = freqs < f_min
+    psd[low] = psd_ref + psd_ref*(f_min-freqs[low])*np.exp(-(f_min-freqs[low]))/3
+    return psd
+
+
+# In-memory cache of the PSDs, from least to most recently used.
+psd_cache = OrderedDict()
+psd_cache_size = 16
+
+def clear_psd_cache():
+    psd_cache.clear()
+
+def get_psd(ifo: str, f_sampling: int = 2048, duration: int = 4, f_min: float = 30., cache_dir: Optional[str] = None) -> np.ndarray:
+    """
+    Cached version of compute_psd.
+
+    PSDs are kept in memory for the lifetime of the process, keyed by the PSD function and the grid parameters.
+    The least recently used entry is evicted once there are more than psd_cache_size entries.
+    If cache_dir is given, the PSDs are also stored there as .npy files and memory-mapped on later calls,
+    so they can be shared across processes.
+
+    Returns:
+        A read-only array with the PSD.
+    """
+    key = (psd_func_dict[ifo].__name__, int(f_sampling), float(duration), float(f_min))
+    if key in psd_cache:
+        psd_cache.move_to_end(key)
+        return psd_cache[key]
+
+    psd = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, '{}_fs{}_T{}_fmin{}.npy'.format(*key))
+        if os.path.exists(path):
+            psd = np.load(path, mmap_mode='r')
+    if psd is None:
+        psd = compute_psd(ifo, f_sampling, duration, f_min)
+        psd.setflags(write=False)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary file first so concurrent jobs never read a partial file.
+            tmp_path = path + '.{}.tmp'.format(os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, psd)
+            os.replace(tmp_path, path)
+
+    psd_cache[key] = psd
+    while len(psd_cache) > psd_cache_size:
+        psd_cache.popitem(last=False)
+    return psd
+
+def generate_noise(seed: int, f_sampling: int = 2048, duration: int = 4, f_min: float = 30., ifos: List = ['H1', 'L1'], cache_dir: Optional[str] = None):
+
+
+    freqs = get_frequencies(f_sampling, duration)
+    delta_f = freqs[1] - freqs[0]
 
     psd_dict = {}
     for ifo in ifos:
-        psd = np.zeros(len(freqs))
-        for i,f in enumerate(freqs):
-            if f >= f_min:
-                psd[i] = psd_func_dict[ifo](f)
-            else:
-                psd[i] = pad_low_freqs(f, psd_func_dict[ifo](f_min))
-        psd_dict[ifo] = jnp.array(psd,dtype=jnp.float64)
+        psd_dict[ifo] = jnp.array(get_psd(ifo, f_sampling, duration, f_min, cache_dir), dtype=jnp.float64)
 
     rng_key = jax.random.PRNGKey(seed)
     rng_keys = jax.random.split(rng_key)
@@ -50,4 +125,46 @@ def generate_noise(seed: int, f_sampling: int = 2048, duration: int = 4, f_min:
         noise_imag = jax.random.normal(rng_keys[2],shape=(len(psd),))*jnp.sqrt(var)
         noise_fd_dict[ifo] = noise_real + 1j*noise_imag
 
-    return freqs, psd_dict, noise_fd_dict
\ No newline at end of file
+    return freqs, psd_dict, noise_fd_dict
+
+@jax.jit
+def draw_noise_batch(seeds: jnp.ndarray, psd: jnp.ndarray, delta_f: float) -> jnp.ndarray:
+    """
+    Draw one noise realization per seed for every detector.
+    The keys are split in the same order as in generate_noise, so each realization matches generate_noise(seed).
+
+    Args:
+        seeds: Integer seeds, shape (n_seeds,).
+        psd: PSDs, shape (n_ifo, n_freq).
+        delta_f: Frequency resolution.
+
+    Returns:
+        Complex noise with shape (n_seeds, n_ifo, n_freq).
+    """
+    sigma = jnp.sqrt(psd / (4.*delta_f))
+
+    def draw_single(seed):
+        rng_keys = jax.random.split(jax.random.PRNGKey(seed))
+        noise = []
+        for i in range(psd.shape[0]):
+            rng_keys = jax.random.split(rng_keys[0], 3)
+            noise_real = jax.random.normal(rng_keys[1], shape=(psd.shape[1],))*sigma[i]
+            noise_imag = jax.random.normal(rng_keys[2], shape=(psd.shape[1],))*sigma[i]
+            noise.append(noise_real + 1j*noise_imag)
+        return jnp.stack(noise)
+
+    return jax.vmap(draw_single)(seeds)
+
+def generate_noise_batch(seeds: List[int], f_sampling: int = 2048, duration: int = 4, f_min: float = 30., ifos: List = ['H1', 'L1'], cache_dir: Optional[str] = None):
+    """
+    Generate noise for many seeds in a single jitted call, reusing the cached PSDs.
+
+    Returns:
+        freqs, the PSDs with shape (n_ifo, n_freq) and the noise with shape (n_seeds, n_ifo, n_freq).
+        The detectors are ordered as in ifos.
+    """
+    freqs = get_frequencies(f_sampling, duration)
+    delta_f = freqs[1] - freqs[0]
+    psd = jnp.stack([jnp.array(get_psd(ifo, f_sampling, duration, f_min, cache_dir), dtype=jnp.float64) for ifo in ifos])
+    noise = draw_noise_batch(jnp.asarray(seeds), psd, delta_f)
+    return freqs, psd, noise
@@ -1,46 +1,107 @@
 import wave
 import numpy as np
-from scipy.interpolate import interp1d
 
+import jax
 import jax.numpy as jnp
 
+from jimgw.PE.detector_projection import make_stacked_detector_response, make_rotating_detector_response, antenna_pattern, time_delay_geocentric_stacked
+from jimgw.PE.constants import earth_angular_velocity
+from jimgw.PE.utils import time_to_merger
+
 def max_phase_diff(f, f_low, f_high, chi=1):
+    """
+    Upper bound on the phase difference accumulated between f[0] and f, following Zackay et al. (2018).
+    The sum over the post-Newtonian powers gamma is accumulated term by term,
+    so the memory footprint stays O(len(f)).
+    """
     gamma = np.arange(-5,6,1)/3.
-    f = np.repeat(f[:,None],len(gamma),axis=1)
-    f_star = np.repeat(f_low, len(gamma))
-    f_star[gamma >= 0] = f_high
-    return 2*np.pi*chi*np.sum((f/f_star)**gamma*np.sign(gamma),axis=1)
-
-
-def make_binning_scheme(freqs, n_bins, chi=1):
-    phase_diff_array = max_phase_diff(freqs,freqs[0],freqs[-1],chi=1)
-    bin_f = interp1d(phase_diff_array, freqs)
-    f_bins = np.array([])
-    for i in np.linspace(phase_diff_array[0], phase_diff_array[-1], n_bins):
-        f_bins = np.append(f_bins,bin_f(i))
+    f = np.asarray(f)
+    phase_diff = np.zeros(f.shape)
+    for g in gamma[gamma != 0]:
+        f_star = f_low if g < 0 else f_high
+        phase_diff += np.sign(g)*(f/f_star)**g
+    return 2*np.pi*chi*phase_diff
+
+def get_n_bins(freqs, max_phase_error, chi=1):
+    """
+    Number of bin edges needed so that the phase difference bound accumulated across any bin
+    is at most max_phase_error (in radians).
+    """
+    phase_diff_array = max_phase_diff(freqs,freqs[0],freqs[-1],chi=chi)
+    return int(np.ceil((phase_diff_array[-1] - phase_diff_array[0])/max_phase_error)) + 1
+
+def make_binning_scheme(freqs, n_bins=None, chi=1, max_phase_error=None):
+    """
+    Place the bin edges uniformly in the phase difference bound returned by max_phase_diff.
+
+    Args:
+        freqs: Frequency grid of the data.
+        n_bins: Number of bin edges. If None, it is chosen from max_phase_error with get_n_bins.
+        chi: Scale of the phase difference bound, only used with max_phase_error.
+        max_phase_error: Maximum phase difference bound across a bin, in radians.
+
+    Returns:
+        The bin edges and the bin centers.
+    """
+    if n_bins is None:
+        if max_phase_error is None:
+            raise ValueError("Either n_bins or max_phase_error has to be given.")
+        n_bins = get_n_bins(freqs, max_phase_error, chi)
+    phase_diff_array = max_phase_diff(freqs,freqs[0],freqs[-1],chi=chi)
+    f_bins = np.interp(np.linspace(phase_diff_array[0], phase_diff_array[-1], n_bins), phase_diff_array, freqs)
     f_bins_center = (f_bins[:-1] + f_bins[1:])/2
     return f_bins, f_bins_center
 
 def compute_coefficients(data, h_ref, psd, freqs, f_bins, f_bins_center):
-    A0_array = []
-    A1_array = []
-    B0_array = []
-    B1_array = []
+    """
+    Compute the heterodyne coefficients A0, A1, B0, B1 for every bin in a single pass.
+
+    Each frequency sample is assigned to the bin [f_bins[i], f_bins[i+1]) with searchsorted,
+    and the per-bin sums are done with segmented reductions.
+    data, h_ref and psd can carry leading axes (e.g. a detector axis), in which case
+    the coefficients are computed for all of them at once.
 
+    Args:
+        data: Frequency domain data, shape (..., N).
+        h_ref: Reference waveform projected onto the detector, shape (..., N).
+        psd: Power spectral density, shape (..., N).
+        freqs: Frequency grid, shape (N,).
+        f_bins: Bin edges, shape (n_bins,).
+        f_bins_center: Bin centers, shape (n_bins-1,).
+
+    Returns:
+        A tuple of A0, A1, B0, B1 with shape (..., n_bins-1).
+    """
+    freqs = np.asarray(freqs)
+    f_bins = np.asarray(f_bins)
     df = freqs[1] - freqs[0]
-    data_prod = np.array(data*h_ref.conj())
-    self_prod = np.array(h_ref*h_ref.conj())
-    for i in range(len(f_bins)-1):
-        f_index = np.where((freqs >= f_bins[i]) & (freqs < f_bins[i+1]))[0]
-        A0_array.append(4*np.sum(data_prod[f_index]/psd[f_index])*df)
-        A1_array.append(4*np.sum(data_prod[f_index]/psd[f_index]*(freqs[f_index]-f_bins_center[i]))*df)
-        B0_array.append(4*np.sum(self_prod[f_index]/psd[f_index])*df)
-        B1_array.append(4*np.sum(self_prod[f_index]/psd[f_index]*(freqs[f_index]-f_bins_center[i]))*df)
-
-    A0_array = jnp.array(A0_array)
-    A1_array = jnp.array(A1_array)
-    B0_array = jnp.array(B0_array)
-    B1_array = jnp.array(B1_array)
+    data = np.asarray(data)
+    h_ref = np.asarray(h_ref)
+    psd = np.asarray(psd)
+
+    data_prod = 4*data*h_ref.conj()/psd*df
+    self_prod = 4*h_ref*h_ref.conj()/psd*df
+
+    # Start index of every bin.
+    bin_start = np.searchsorted(freqs, f_bins, side='left')
+    empty_bin = bin_start[1:] == bin_start[:-1]
+
+    # Offset of every sample from the center of the bin it falls in.
+    bin_index = np.searchsorted(f_bins, freqs, side='right') - 1
+    bin_index = bin_index.clip(0, len(f_bins)-2)
+    f_offset = freqs - np.asarray(f_bins_center)[bin_index]
+
+    def segment_sum(x):
+        # The trailing zero pad keeps the indices valid for reduceat when the last bins are empty.
+        pad = np.zeros(x.shape[:-1] + (1,), dtype=x.dtype)
+        x = np.concatenate([x, pad], axis=-1)
+        output = np.add.reduceat(x, bin_start, axis=-1)[..., :-1]
+        return np.where(empty_bin, 0, output)
+
+    A0_array = jnp.array(segment_sum(data_prod))
+    A1_array = jnp.array(segment_sum(data_prod*f_offset))
+    B0_array = jnp.array(segment_sum(self_prod))
+    B1_array = jnp.array(segment_sum(self_prod*f_offset))
     return A0_array, A1_array, B0_array, B1_array
 
 def make_heterodyne_likelihood(data, h_function, ref_theta, psd, freqs, n_bins=101):
@@ -91,19 +152,8 @@ def make_heterodyne_likelihood_mutliple_detector(data_list, psd_list, respose_li
         h_ref_low.append(respose_list[i](f_bins[:-1], raw_hp_bin, raw_hc_bin, ra, dec, gmst, ref_theta[8])*jnp.exp(-1j*2*jnp.pi*f_bins[:-1]*(epoch+ref_theta[5])))
         h_ref_bincenter.append(respose_list[i](f_bins_center, raw_hp_bincenter, raw_hc_bincenter, ra, dec, gmst, ref_theta[8])*jnp.exp(-1j*2*jnp.pi*f_bins_center*(epoch+ref_theta[5])))
     
-    A0_array = []
-    A1_array = []
-    B0_array = []
-    B1_array = []
+    A0_array, A1_array, B0_array, B1_array = compute_coefficients(jnp.stack(data_list), jnp.stack(h_ref), jnp.stack(psd_list), freqs, f_bins, f_bins_center)
 
-    for i in range(num_detector):
-        A0, A1, B0, B1 = compute_coefficients(data_list[i], h_ref[i], psd_list[i], freqs, f_bins, f_bins_center)
-        A0_array.append(A0)
-        A1_array.append(A1)
-        B0_array.append(B0)
-        B1_array.append(B1)
-        
-        
     def hetrodyne_likelihood(params):
         theta_waveform = params
         theta_waveform = theta_waveform.at[5].set(0)
@@ -128,3 +178,353 @@ def make_heterodyne_likelihood_mutliple_detector(data_list, psd_list, respose_li
         return output_SNR
     
     return hetrodyne_likelihood
+
+def make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins=101, max_phase_error=None, earth_rotation=False):
+    """
+    Build the heterodyne coefficients and reference waveforms for a stack of detectors.
+
+    Args:
+        data_list: List of frequency domain data, one per detector.
+        psd_list: List of PSDs, one per detector.
+        detector_tensors: Detector tensors, shape (n_det, 3, 3).
+        detector_vertices: Detector vertices, shape (n_det, 3).
+        h_function: Waveform model returning hp, hc given (f, theta, f_ref).
+        ref_theta: Reference parameters.
+        freqs: Frequency grid of the data.
+        gmst: Greenwich mean sidereal time.
+        epoch: Epoch of the data segment.
+        f_ref: Reference frequency of the waveform.
+        n_bins: Number of bin edges. If None, it is chosen from max_phase_error.
+        max_phase_error: Maximum phase difference bound across a bin, see make_binning_scheme.
+        earth_rotation: If True, the reference waveform accounts for the rotation of the Earth during the signal,
+            see make_rotating_detector_response. The kernel has to be made with the same option.
+
+    Returns:
+        A dictionary of arrays with a leading detector axis (except for the bin frequencies),
+        which can be passed to the kernel returned by make_heterodyne_kernel.
+    """
+    if earth_rotation:
+        rotating_response = make_rotating_detector_response(detector_tensors, detector_vertices)
+        detector_response = lambda f, hp, hc, ra, dec, gmst, psi: rotating_response(f, hp, hc, ra, dec, gmst, psi, time_to_merger(f, ref_theta[0]))
+    else:
+        detector_response = make_stacked_detector_response(detector_tensors, detector_vertices)
+    theta_waveform = ref_theta.at[5].set(0)
+    raw_hp, raw_hc = h_function(freqs, theta_waveform, f_ref)
+    index = jnp.where((jnp.abs(raw_hc)+jnp.abs(raw_hp)) > 0)
+    freqs = freqs[index]
+    raw_hp = raw_hp[index]
+    raw_hc = raw_hc[index]
+    data = jnp.stack([data[index] for data in data_list])
+    psd = jnp.stack([psd[index] for psd in psd_list])
+
+    f_bins, f_bins_center = make_binning_scheme(freqs, n_bins, max_phase_error=max_phase_error)
+    ra, dec, psi = ref_theta[9], ref_theta[10], ref_theta[8]
+    h_ref = detector_response(freqs, raw_hp, raw_hc, ra, dec, gmst, psi)*jnp.exp(-1j*2*jnp.pi*freqs*(epoch+ref_theta[5]))
+    f_bins_all = np.stack([f_bins[:-1], f_bins_center], axis=-1).reshape(-1)
+    raw_hp_bin, raw_hc_bin = h_function(f_bins_all, theta_waveform, f_ref)
+    h_ref_bin = detector_response(f_bins_all, raw_hp_bin, raw_hc_bin, ra, dec, gmst, psi)*jnp.exp(-1j*2*jnp.pi*f_bins_all*(epoch+ref_theta[5]))
+    h_ref_low, h_ref_bincenter = h_ref_bin[:, 0::2], h_ref_bin[:, 1::2]
+
+    A0, A1, B0, B1 = compute_coefficients(data, h_ref, psd, freqs, f_bins, f_bins_center)
+
+    return {
+        'f_bins_low': jnp.array(f_bins[:-1]),
+        'f_bins_center': jnp.array(f_bins_center),
+        'h_ref_low': h_ref_low,
+        'h_ref_bincenter': h_ref_bincenter,
+        'A0': A0,
+        'A1': A1,
+        'B0': B0,
+        'B1': B1,
+    }
+
+def make_heterodyne_snr_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins=True, earth_rotation=False):
+    """
+    Make the heterodyne matched filter and optimal SNR for a stack of detectors, evaluated on a batch of chains.
+
+    The bin frequencies, the reference waveforms and the coefficients are shared by all chains,
+    and only the waveform call is mapped over the batch. The projection onto every detector and
+    the time shifts are computed with broadcasting, with shapes (n_chains, n_det, n_bins-1).
+
+    If concatenate_bins is True, the bin edges and centers are joined into a single grid,
+    so the waveform model and the time shift phases are evaluated once per likelihood call instead of twice.
+
+    If earth_rotation is True, the antenna patterns and time delays are evaluated at the sidereal time at which
+    every bin frequency is emitted, using the leading order time to merger of every chain. This is only done
+    on the bin frequencies, so long signals get the rotating projection at little cost.
+
+    Returns:
+        A function snr_kernel(params, state), where params has shape (n_chains, n_dim) and state is the
+        output of make_heterodyne_state. It returns the complex matched filter SNR summed over detectors,
+        whose real part enters the likelihood, and the optimal SNR, both with shape (n_chains,).
+    """
+    waveform_batched = jax.vmap(h_function, in_axes=(None, 0, None))
+
+    def antenna_and_delay(ra, dec, gmst, psi):
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        return antenna_plus, antenna_cross, time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+
+    antenna_and_delay_batched = jax.vmap(antenna_and_delay, in_axes=(0, 0, None, 0), out_axes=-1)
+    antenna_and_delay_rotating = jax.vmap(jax.vmap(antenna_and_delay, in_axes=(None, None, 0, None), out_axes=-1))
+
+    def response(f, params):
+        # Antenna patterns and geocentric arrival time plus the delay to every detector,
+        # with shape (n_chains, n_det, len(f)), or (n_chains, n_det, 1) without Earth rotation.
+        ra, dec, psi = params[:, 9], params[:, 10], params[:, 8]
+        if earth_rotation:
+            gmst_f = gmst - earth_angular_velocity*time_to_merger(f, params[:, 0:1])
+            antenna_plus, antenna_cross, timeshift = antenna_and_delay_rotating(ra, dec, gmst_f, psi)
+        else:
+            antenna_plus, antenna_cross, timeshift = [x.T[:, :, None] for x in antenna_and_delay_batched(ra, dec, gmst, psi)]
+        return antenna_plus, antenna_cross, epoch + params[:, 5, None, None] + timeshift
+
+    def project(f, theta_waveform, params):
+        hp, hc = waveform_batched(f, theta_waveform, f_ref)
+        antenna_plus, antenna_cross, time = response(f, params)
+        output = antenna_plus*hp[:, None] + antenna_cross*hc[:, None]
+        return output*jnp.exp(-1j*2*jnp.pi*f*time)
+
+    def snr_kernel(params, state):
+        f_low = state['f_bins_low']
+        f_center = state['f_bins_center']
+        # Zero out tc without a scatter, the time shift is applied on the projected waveform.
+        theta_waveform = jnp.where(jnp.arange(params.shape[-1]) == 5, 0., params)
+
+        if concatenate_bins:
+            # Interleaving keeps the grid sorted, which waveform models with a frequency cutoff rely on.
+            f_all = jnp.stack([f_low, f_center], axis=-1).reshape(-1)
+            waveform = project(f_all, theta_waveform, params)
+            waveform_low, waveform_center = waveform[..., 0::2], waveform[..., 1::2]
+        else:
+            waveform_low = project(f_low, theta_waveform, params)
+            waveform_center = project(f_center, theta_waveform, params)
+
+        r0 = waveform_center/state['h_ref_bincenter']
+        r1 = (waveform_low/state['h_ref_low'] - r0)/(f_low-f_center)
+        match_filter_SNR = jnp.sum(state['A0']*r0.conj() + state['A1']*r1.conj(), axis=(1, 2))
+        optimal_SNR = jnp.sum(state['B0']*jnp.abs(r0)**2 + 2*state['B1']*(r0*r1.conj()).real, axis=(1, 2)).real
+        return match_filter_SNR, optimal_SNR
+
+    return snr_kernel
+
+def make_heterodyne_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins=True, earth_rotation=False):
+    """
+    Make the heterodyne log-likelihood for a stack of detectors, evaluated on a batch of chains.
+    See make_heterodyne_snr_kernel_batched for the arguments.
+
+    Returns:
+        A function heterodyne_kernel(params, state), where params has shape (n_chains, n_dim),
+        state is the output of make_heterodyne_state, and the output has shape (n_chains,).
+    """
+    snr_kernel = make_heterodyne_snr_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins, earth_rotation)
+
+    def heterodyne_kernel(params, state):
+        match_filter_SNR, optimal_SNR = snr_kernel(params, state)
+        return match_filter_SNR.real - optimal_SNR/2
+
+    return heterodyne_kernel
+
+def make_heterodyne_kernel(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins=True, earth_rotation=False):
+    """
+    Make the heterodyne log-likelihood for a stack of detectors.
+    All detectors are projected and compared to the reference in one vectorized pass.
+
+    Returns:
+        A function heterodyne_kernel(params, state), where state is the output of make_heterodyne_state.
+    """
+    heterodyne_kernel_batched = make_heterodyne_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins, earth_rotation)
+
+    def heterodyne_kernel(params, state):
+        return heterodyne_kernel_batched(params[None], state)[0]
+
+    return heterodyne_kernel
+
+def make_heterodyne_likelihood_stacked_detector(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins=101, concatenate_bins=True, max_phase_error=None, earth_rotation=False):
+    """
+    Drop-in alternative to make_heterodyne_likelihood_mutliple_detector that takes stacked detector
+    tensors and vertices instead of a list of response functions, so the size of the graph
+    does not grow with the number of detectors.
+    """
+    state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins, max_phase_error, earth_rotation)
+    heterodyne_kernel = make_heterodyne_kernel(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins, earth_rotation)
+
+    def hetrodyne_likelihood(params):
+        return heterodyne_kernel(params, state)
+
+    return hetrodyne_likelihood
+
+def make_heterodyne_likelihood_batched(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins=101, concatenate_bins=True, max_phase_error=None, earth_rotation=False):
+    """
+    Same as make_heterodyne_likelihood_stacked_detector, but the returned function takes
+    a batch of parameters with shape (n_chains, n_dim) and returns the log-likelihood with shape (n_chains,).
+    """
+    state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins, max_phase_error, earth_rotation)
+    heterodyne_kernel = make_heterodyne_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins, earth_rotation)
+
+    def hetrodyne_likelihood(params):
+        return heterodyne_kernel(params, state)
+
+    return hetrodyne_likelihood
+
+def log_i0(x):
+    """
+    Logarithm of the modified Bessel function I0, stable for large arguments.
+    """
+    return jnp.log(jax.scipy.special.i0e(x)) + jnp.abs(x)
+
+def make_heterodyne_phase_marginalized_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins=True):
+    """
+    Make the heterodyne log-likelihood marginalized over a uniform prior on phic, evaluated on a batch of chains.
+
+    For a waveform with only the (2, 2) mode, such as IMRPhenomD, phic only enters as a global factor exp(2i phic).
+    The complex matched filter Z, summed over detectors at phic = 0, then gives log I0(|Z|) - <h|h>/2.
+    The arguments and the returned function are the same as for make_heterodyne_kernel_batched,
+    the value of phic in params is ignored.
+    """
+    snr_kernel = make_heterodyne_snr_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins)
+
+    def phase_marginalized_kernel(params, state):
+        params = jnp.where(jnp.arange(params.shape[-1]) == 6, 0., params)
+        match_filter_SNR, optimal_SNR = snr_kernel(params, state)
+        return log_i0(jnp.abs(match_filter_SNR)) - optimal_SNR/2
+
+    return phase_marginalized_kernel
+
+def make_heterodyne_likelihood_phase_marginalized(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins=101, concatenate_bins=True, max_phase_error=None):
+    """
+    Same as make_heterodyne_likelihood_batched, but marginalized over phic.
+    """
+    state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins, max_phase_error)
+    phase_marginalized_kernel = make_heterodyne_phase_marginalized_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins)
+
+    def hetrodyne_likelihood(params):
+        return phase_marginalized_kernel(params, state)
+
+    return hetrodyne_likelihood
+
+def make_phase_reconstruction(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins=True, n_grid=1024):
+    """
+    Draw phic from its conditional posterior, to recover phic samples after sampling with the phase-marginalized likelihood.
+
+    The posterior of 2 phic is proportional to exp(|Z| cos(arg Z - 2 phic)). It is sampled on a grid of n_grid
+    cells with a uniform draw within the cell, and one of the two branches of phic is picked at random.
+
+    Returns:
+        A function sample_phase(key, params, state), where params has shape (n_chains, n_dim) and
+        state is the output of make_heterodyne_state, returning phic with shape (n_chains,).
+    """
+    snr_kernel = make_heterodyne_snr_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins)
+    alpha_grid = jnp.linspace(0, 2*jnp.pi, n_grid, endpoint=False)
+
+    def sample_phase(key, params, state):
+        params = jnp.where(jnp.arange(params.shape[-1]) == 6, 0., params)
+        match_filter_SNR, _ = snr_kernel(params, state)
+        log_posterior = jnp.abs(match_filter_SNR)[:, None]*jnp.cos(jnp.angle(match_filter_SNR)[:, None] - alpha_grid)
+        key_grid, key_cell, key_branch = jax.random.split(key, 3)
+        index = jax.random.categorical(key_grid, log_posterior)
+        alpha = alpha_grid[index] + jax.random.uniform(key_cell, index.shape)*2*jnp.pi/n_grid
+        branch = jax.random.bernoulli(key_branch, shape=index.shape)
+        return jnp.mod(alpha/2 + jnp.pi*branch, 2*jnp.pi)
+
+    return sample_phase
+
+def make_adaptive_heterodyne_likelihood(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins=101, concatenate_bins=True, max_phase_error=None, threshold=1.):
+    """
+    Heterodyne likelihood whose reference can be moved during sampling.
+
+    The likelihood takes the heterodyne state as an argument, so a jitted sampler step that
+    receives the state as an input keeps its compiled kernel when the state is rebuilt.
+    The number of bins is fixed at construction, so every rebuilt state has the same shapes.
+
+    Between sampling loops, call update_state with the current samples. The likelihood of the samples
+    is compared to the likelihood at the reference, which is sum(A0) - sum(B0)/2. If the best sample
+    improves on it by more than threshold, the coefficients are rebuilt around that sample.
+
+    Returns:
+        likelihood(params, state) with params of shape (n_chains, n_dim),
+        the initial state, and update_state(state, samples) returning the new state and whether it was rebuilt.
+    """
+    if n_bins is None:
+        n_bins = get_n_bins(freqs, max_phase_error)
+    heterodyne_kernel = make_heterodyne_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref, concatenate_bins)
+    heterodyne_kernel_jit = jax.jit(heterodyne_kernel)
+
+    def build_state(theta):
+        return make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, theta, freqs, gmst, epoch, f_ref, n_bins)
+
+    def update_state(state, samples):
+        samples = jnp.reshape(samples, (-1, samples.shape[-1]))
+        log_likelihood = jnp.nan_to_num(heterodyne_kernel_jit(samples, state), nan=-jnp.inf)
+        best = jnp.argmax(log_likelihood)
+        ref_log_likelihood = (jnp.sum(state['A0']) - jnp.sum(state['B0'])/2).real
+        if log_likelihood[best] - ref_log_likelihood > threshold:
+            return build_state(samples[best]), True
+        return state, False
+
+    return heterodyne_kernel, build_state(ref_theta), update_state
+
+def find_reference_parameters(data_list, psd_list, detector_tensors, detector_vertices, h_function, trial_theta, prior_range, freqs, gmst, epoch, f_ref, n_bins=101, n_candidates=10000, n_refine=16, n_steps=200, learning_rate=1e-2, n_iterations=2, batch_size=1000, seed=0):
+    """
+    Search for a reference point for the heterodyne likelihood, so real events need no hand-tuned ref_theta.
+
+    A cheap heterodyne likelihood is built around trial_theta and evaluated on n_candidates points drawn
+    uniformly within prior_range, in batches of batch_size. The n_refine best points are then refined
+    by gradient ascent (Adam, in coordinates rescaled to the unit cube), and the coefficients are rebuilt
+    around the best point. The gradient refinement and the rebuild are repeated n_iterations times.
+    With n_iterations=0, the best coarse candidate is returned without refinement.
+    The kernel takes the heterodyne state as an argument, so it is only compiled once.
+
+    Args:
+        trial_theta: Starting guess of the parameters, e.g. from a search pipeline.
+        prior_range: Lower and upper bounds of the parameters, shape (n_dim, 2).
+        The other arguments are the same as for make_heterodyne_state.
+
+    Returns:
+        The reference parameters and the heterodyne state built around them.
+    """
+    prior_range = jnp.asarray(prior_range)
+    lower, width = prior_range[:, 0], prior_range[:, 1] - prior_range[:, 0]
+    heterodyne_kernel = make_heterodyne_kernel_batched(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+    heterodyne_kernel_jit = jax.jit(heterodyne_kernel)
+
+    def negative_log_likelihood(x, state):
+        return -heterodyne_kernel((lower + x*width)[None], state)[0]
+
+    value_and_grad = jax.vmap(jax.value_and_grad(negative_log_likelihood), in_axes=(0, None))
+
+    @jax.jit
+    def refine(x, state):
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        def step(carry, i):
+            x, m, v = carry
+            value, grad = value_and_grad(x, state)
+            grad = jnp.nan_to_num(grad)
+            m = beta1*m + (1-beta1)*grad
+            v = beta2*v + (1-beta2)*grad**2
+            m_hat = m/(1-beta1**(i+1))
+            v_hat = v/(1-beta2**(i+1))
+            x = jnp.clip(x - learning_rate*m_hat/(jnp.sqrt(v_hat)+eps), 0., 1.)
+            return (x, m, v), value
+        (x, _, _), _ = jax.lax.scan(step, (x, jnp.zeros_like(x), jnp.zeros_like(x)), jnp.arange(n_steps))
+        return x, jax.vmap(negative_log_likelihood, in_axes=(0, None))(x, state)
+
+    state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, trial_theta, freqs, gmst, epoch, f_ref, n_bins)
+
+    # Coarse global search on the cheap heterodyne likelihood.
+    candidates = jax.random.uniform(jax.random.PRNGKey(seed), shape=(n_candidates, len(lower)))
+    candidates = jnp.concatenate([jnp.clip((trial_theta - lower)/width, 0., 1.)[None], candidates])
+    log_likelihood = jnp.concatenate([heterodyne_kernel_jit(lower + candidates[i:i+batch_size]*width, state) for i in range(0, len(candidates), batch_size)])
+    log_likelihood = jnp.nan_to_num(log_likelihood, nan=-jnp.inf)
+    x = candidates[jnp.argsort(-log_likelihood)[:n_refine]]
+    ref_theta = lower + x[0]*width
+
+    for i in range(n_iterations):
+        x, loss = refine(x, state)
+        best = jnp.nanargmin(loss)
+        ref_theta = lower + x[best]*width
+        state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins)
+        x = x[best][None]
+
+    if n_iterations == 0:
+        state = make_heterodyne_state(data_list, psd_list, detector_tensors, detector_vertices, h_function, ref_theta, freqs, gmst, epoch, f_ref, n_bins)
+    return ref_theta, state
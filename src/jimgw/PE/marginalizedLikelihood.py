@@ -0,0 +1,211 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+from jax.scipy.special import logsumexp
+
+from jimgw.PE.frequency_domain_data import make_frequency_domain_data, make_projected_waveform, match_filter_snr, optimal_snr
+
+def make_time_series_kernel(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, tc_range):
+    """
+    Make a function computing the matched filter SNR for every coalescence time in tc_range at once.
+
+    The whitened product conj(h) d/S of every detector is summed over detectors, since they share tc,
+    and a single inverse FFT gives the overlap for all time shifts on a grid of spacing 1/(n_fft df).
+
+    Args:
+        data_list: List of frequency domain data, one per detector.
+        psd_list: List of PSDs, one per detector.
+        detector_tensors: Detector tensors, shape (n_det, 3, 3).
+        detector_vertices: Detector vertices, shape (n_det, 3).
+        h_function: Waveform model returning hp, hc given (f, theta, f_ref).
+        freqs: Uniform frequency grid of the data, a contiguous part of the FFT grid of the segment.
+        gmst: Greenwich mean sidereal time.
+        epoch: Epoch of the data segment.
+        f_ref: Reference frequency of the waveform.
+        tc_range: Lower and upper bound of the uniform prior on tc.
+
+    Returns:
+        The grid of coalescence times within tc_range, and a function time_series(params) returning
+        the matched filter SNR on that grid and the optimal SNR. The value of tc in params is ignored.
+    """
+    freqs = np.asarray(freqs)
+    df = freqs[1] - freqs[0]
+    index_low = int(np.rint(freqs[0]/df))
+    n_fft = 2**int(np.ceil(np.log2(index_low + len(freqs))))
+    tc_index = np.arange(np.ceil(tc_range[0]*n_fft*df), np.floor(tc_range[1]*n_fft*df) + 1).astype(int)
+    tc_grid = tc_index/(n_fft*df)
+    tc_index = tc_index % n_fft
+
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    projected_waveform = make_projected_waveform(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+
+    def time_series(params):
+        h = projected_waveform(frequency_domain_data['frequencies'], jnp.where(jnp.arange(params.shape[-1]) == 5, 0., params))
+        overlap = jnp.sum(jnp.conj(h)*frequency_domain_data['weighted_data'], axis=0)
+        overlap = jnp.pad(overlap, (index_low, n_fft - index_low - len(freqs)))
+        match_filter_SNR = (n_fft*jnp.fft.ifft(overlap)).real[tc_index]
+        return match_filter_SNR, optimal_snr(h, frequency_domain_data)
+
+    return tc_grid, time_series
+
+def make_time_marginalized_likelihood(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, tc_range):
+    """
+    Log-likelihood marginalized over a uniform prior on the coalescence time.
+    The arguments are the same as for make_time_series_kernel.
+
+    Returns:
+        A function time_marginalized_likelihood(params), which ignores the value of tc in params.
+    """
+    tc_grid, time_series = make_time_series_kernel(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, tc_range)
+
+    def time_marginalized_likelihood(params):
+        match_filter_SNR, optimal_SNR = time_series(params)
+        return logsumexp(match_filter_SNR) - jnp.log(len(tc_grid)) - optimal_SNR/2
+
+    return time_marginalized_likelihood
+
+def make_time_reconstruction(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, tc_range):
+    """
+    Draw the coalescence time from its conditional posterior, to recover tc samples after sampling
+    with the time-marginalized likelihood. The arguments are the same as for make_time_series_kernel.
+
+    Returns:
+        A function sample_time(key, params) returning a sample of tc on the time grid.
+    """
+    tc_grid, time_series = make_time_series_kernel(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, tc_range)
+    tc_grid = jnp.array(tc_grid)
+
+    def sample_time(key, params):
+        match_filter_SNR, _ = time_series(params)
+        return tc_grid[jax.random.categorical(key, match_filter_SNR)]
+
+    return sample_time
+
+def make_snr_kernel(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref):
+    """
+    Make the full-resolution matched filter and optimal SNR for a stack of detectors.
+    The arguments are the same as for make_time_series_kernel.
+
+    Returns:
+        A function snr_kernel(params) returning the complex matched filter SNR summed over detectors,
+        whose real part enters the likelihood, and the optimal SNR.
+    """
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    projected_waveform = make_projected_waveform(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+
+    def snr_kernel(params):
+        h = projected_waveform(frequency_domain_data['frequencies'], params)
+        return match_filter_snr(h, frequency_domain_data), optimal_snr(h, frequency_domain_data)
+
+    return snr_kernel
+
+def make_distance_marginalization_table(distance_prior, distance_bounds, n_distance=2000, log_optimal_snr_bounds=(-4., 3.), n_optimal_snr=141, match_snr_bounds=(-10., 200.), n_match_snr=841):
+    """
+    Tabulate the log-likelihood marginalized over the luminosity distance.
+
+    The waveform scales as 1/d, so at distance d the likelihood only depends on the optimal SNR w at the
+    upper distance bound, through s = w d_max/d, and on z = <d|h>/sqrt(<h|h>), which does not depend on d:
+    log L(d) = s z - s^2/2. The table stores, on a uniform grid of (log10 w, z), the marginal
+    log int p(d) exp(s z - s^2/2) dd minus the maximum of s z - s^2/2 over the prior range, which is added
+    back analytically. The residual is smooth, so a bilinear interpolation of it is accurate.
+    Points outside the table are clamped to its edges.
+
+    Args:
+        distance_prior: Function returning the unnormalized prior density of the distance, e.g. uniform in comoving volume.
+        distance_bounds: Lower and upper bound of the distance prior in Mpc.
+        n_distance: Number of points of the distance grid, uniform in log d.
+        log_optimal_snr_bounds: Range of log10 of the optimal SNR at the upper distance bound.
+        n_optimal_snr: Number of grid points in log10 w.
+        match_snr_bounds: Range of z.
+        n_match_snr: Number of grid points in z.
+
+    Returns:
+        A dictionary with the grids 'log_optimal_snr', 'match_snr', 'distance', the normalized 'log_prior'
+        of the distance on its grid including the integration weights, and the table 'residual'.
+    """
+    distance = jnp.geomspace(distance_bounds[0], distance_bounds[1], n_distance)
+    # Trapezoidal weights on the log-uniform grid, dd = d dlog(d).
+    log_weight = jnp.log(distance) + jnp.log(jnp.ones(n_distance).at[jnp.array([0, -1])].set(0.5))
+    log_prior = jnp.log(distance_prior(distance)) + log_weight
+    log_prior = log_prior - logsumexp(log_prior)
+    log_optimal_snr = jnp.linspace(*log_optimal_snr_bounds, n_optimal_snr)
+    match_snr = jnp.linspace(*match_snr_bounds, n_match_snr)
+
+    def residual_row(log_w):
+        s = 10**log_w*distance_bounds[1]/distance
+        log_likelihood = s[None]*match_snr[:, None] - s[None]**2/2
+        return logsumexp(log_prior + log_likelihood, axis=-1) - peak_log_likelihood(match_snr, 10**log_w, distance_bounds)
+
+    return {
+        'log_optimal_snr': log_optimal_snr,
+        'match_snr': match_snr,
+        'distance': distance,
+        'log_prior': log_prior,
+        'residual': jax.lax.map(residual_row, log_optimal_snr),
+    }
+
+def peak_log_likelihood(match_snr, optimal_snr_max_distance, distance_bounds):
+    """
+    Maximum of s z - s^2/2 over the distance prior range, see make_distance_marginalization_table.
+    """
+    s = jnp.clip(match_snr, optimal_snr_max_distance, optimal_snr_max_distance*distance_bounds[1]/distance_bounds[0])
+    return s*match_snr - s**2/2
+
+def interpolate_table(table, x, y):
+    """
+    Bilinear interpolation of table['residual'] at (x, y) = (log10 w, z), with index arithmetic on the uniform grids.
+    """
+    x_grid, y_grid = table['log_optimal_snr'], table['match_snr']
+    x_index = jnp.clip((x - x_grid[0])/(x_grid[1] - x_grid[0]), 0, len(x_grid) - 1 - 1e-9)
+    y_index = jnp.clip((y - y_grid[0])/(y_grid[1] - y_grid[0]), 0, len(y_grid) - 1 - 1e-9)
+    i, j = jnp.floor(x_index).astype(int), jnp.floor(y_index).astype(int)
+    u, v = x_index - i, y_index - j
+    residual = table['residual']
+    return (1-u)*(1-v)*residual[i, j] + u*(1-v)*residual[i+1, j] + (1-u)*v*residual[i, j+1] + u*v*residual[i+1, j+1]
+
+def distance_marginalized_log_likelihood(table, match_filter_SNR, optimal_SNR, distance, distance_bounds):
+    """
+    Log-likelihood marginalized over distance, from the SNRs of a waveform at the given distance.
+    Works with the SNRs of the heterodyne or the full likelihood, and broadcasts over their shape.
+    """
+    optimal_SNR = jnp.maximum(optimal_SNR, 1e-30)
+    match_snr = match_filter_SNR/jnp.sqrt(optimal_SNR)
+    optimal_snr_max_distance = jnp.sqrt(optimal_SNR)*distance/distance_bounds[1]
+    residual = interpolate_table(table, jnp.log10(optimal_snr_max_distance), match_snr)
+    return residual + peak_log_likelihood(match_snr, optimal_snr_max_distance, distance_bounds)
+
+def make_distance_marginalized_likelihood(snr_kernel, table, distance_bounds):
+    """
+    Log-likelihood marginalized over distance.
+
+    Args:
+        snr_kernel: Function returning the complex matched filter SNR and the optimal SNR at params,
+            e.g. from make_snr_kernel, or make_heterodyne_snr_kernel_batched with the heterodyne state bound.
+        table: Output of make_distance_marginalization_table.
+        distance_bounds: Lower and upper bound of the distance prior in Mpc.
+
+    Returns:
+        A function distance_marginalized_likelihood(params), which ignores the value of the distance in params.
+    """
+    def distance_marginalized_likelihood(params):
+        match_filter_SNR, optimal_SNR = snr_kernel(params)
+        return distance_marginalized_log_likelihood(table, match_filter_SNR.real, optimal_SNR, params[..., 4], distance_bounds)
+
+    return distance_marginalized_likelihood
+
+def make_distance_reconstruction(snr_kernel, table, distance_bounds):
+    """
+    Draw the distance from its conditional posterior on the grid of the table, to recover distance samples
+    after sampling with the distance-marginalized likelihood. The arguments are the same as for
+    make_distance_marginalized_likelihood, snr_kernel has to take a single set of parameters.
+
+    Returns:
+        A function sample_distance(key, params) returning a sample of the distance in Mpc.
+    """
+    def sample_distance(key, params):
+        match_filter_SNR, optimal_SNR = snr_kernel(params)
+        s = params[4]/table['distance']
+        log_posterior = table['log_prior'] + s*match_filter_SNR.real - s**2*optimal_SNR/2
+        return table['distance'][jax.random.categorical(key, log_posterior)]
+
+    return sample_distance
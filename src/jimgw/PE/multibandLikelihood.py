@@ -0,0 +1,179 @@
+import numpy as np
+import jax.numpy as jnp
+
+from jimgw.PE.constants import Msun
+from jimgw.PE.detector_projection import antenna_pattern, time_delay_geocentric_stacked
+from jimgw.PE.utils import time_to_merger
+
+def make_multiband_bands(freqs, chirp_mass_min, time_margin=0.2, taper_factor=64., leakage_factor=8.):
+    """
+    Split the frequency grid into bands of decreasing duration T/2^b, where T is the segment duration.
+
+    Band b starts at the lowest frequency where the remaining signal of the lowest chirp mass, time_margin
+    on both sides of the merger and the leakage of the band taper fit into T/2^b. The taper of band b is
+    taper_factor/(T/2^b) wide, and the leakage is taken to be leakage_factor inverse taper widths on each side.
+
+    Args:
+        freqs: Uniform frequency grid of the data.
+        chirp_mass_min: Lower bound of the chirp mass prior in solar masses.
+        time_margin: Time in seconds covering the coalescence time prior, the detector delays and the ringdown.
+        taper_factor: Width of the band tapers in units of the coarse frequency spacing of the band.
+        leakage_factor: Time allowed for the leakage of the tapers, in units of the inverse taper width.
+
+    Returns:
+        A list of (f_start, taper_width, stride) for every band, where stride = 2^b is the decimation
+        of the band with respect to the data grid. Band 0 is not decimated and starts at freqs[0].
+    """
+    df = freqs[1] - freqs[0]
+    duration = 1./df
+    bands = [(freqs[0], 0., 1)]
+    stride = 2
+    while True:
+        band_duration = duration/stride
+        taper_width = taper_factor/band_duration
+        tau_max = band_duration - 2*time_margin - 2*leakage_factor/taper_width
+        if tau_max <= 0:
+            break
+        # Invert the leading order time to merger.
+        f_start = (256./5*tau_max*(chirp_mass_min*Msun)**(5./3))**(-3./8)/np.pi
+        f_start = max(f_start, bands[-1][0] + bands[-1][1])
+        if f_start + taper_width >= freqs[-1]:
+            break
+        bands.append((f_start, taper_width, stride))
+        stride *= 2
+    return bands
+
+def band_window(f, bands, b, f_max):
+    """
+    Smooth window of band b, exactly zero outside of the band. The windows of all bands sum to one on the data grid.
+    The last band is tapered above f_max, so that the windowed waveform stays smooth beyond the data.
+    """
+    f_start, taper_width, _ = bands[b]
+    def rise(x):
+        # Planck taper, smooth to all orders so that the leakage in time decays quickly.
+        x = np.clip(x, 0, 1)
+        with np.errstate(divide='ignore'):
+            return np.where(x == 0, 0., np.where(x == 1, 1., np.exp(-np.logaddexp(0, 1./x - 1./(1-x)))))
+    if b > 0:
+        window = rise((f - f_start)/taper_width)
+    else:
+        window = np.where(f >= f_start, 1., 0.)
+    if b + 1 < len(bands):
+        f_next, taper_next, _ = bands[b+1]
+        window *= 1 - rise((f - f_next)/taper_next)
+    elif b > 0:
+        window *= 1 - rise((f - f_max)/taper_width)
+    return window
+
+def make_multiband_state(data_list, psd_list, freqs, epoch, chirp_mass_min, time_margin=0.2, taper_factor=64., leakage_factor=8.):
+    """
+    Build the multibanding weights for a stack of detectors.
+
+    Within band b, the windowed waveform lasts at most T/2^b, so its values on every 2^b-th frequency
+    of the data grid determine it completely. The matched filter sum over the data grid is then exact
+    in terms of the waveform at these nodes, with weights obtained from an inverse FFT of 4 df d/S,
+    cropped to the time window of the signal and transformed back at the coarse resolution.
+    The optimal SNR uses a linear interpolation of |h|^2 between the nodes, with 4 df/S as weights.
+
+    Args:
+        data_list: List of frequency domain data, one per detector.
+        psd_list: List of PSDs, one per detector.
+        freqs: Uniform frequency grid of the data.
+        epoch: Epoch of the data segment, the merger is expected at epoch + tc.
+        The other arguments are the same as for make_multiband_bands.
+
+    Returns:
+        A dictionary with the node frequencies 'f_nodes' of shape (n_nodes,), and the matched filter
+        weights 'D' and optimal SNR weights 'E' of shape (n_det, n_nodes).
+    """
+    freqs = np.asarray(freqs)
+    data = np.stack([np.asarray(data) for data in data_list])
+    psd = np.stack([np.asarray(psd) for psd in psd_list])
+    df = freqs[1] - freqs[0]
+    duration = 1./df
+    bands = make_multiband_bands(freqs, chirp_mass_min, time_margin, taper_factor, leakage_factor)
+
+    # Data grid embedded in a grid starting at zero frequency, extended above f_max for the last taper.
+    data_index = np.rint(freqs/df).astype(int)
+    n_grid = 2**int(np.ceil(np.log2(data_index[-1] + bands[-1][1]/df + 2)))
+    f_grid = np.arange(n_grid)*df
+    g = np.zeros((len(data), n_grid), dtype=complex)
+    g[:, data_index] = 4*df*data/psd
+    y = np.fft.ifft(g, axis=-1)
+    optimal_weight = 4*df/psd
+
+    node_list, D_list, E_list = [], [], []
+    for b, (f_start, taper_width, stride) in enumerate(bands):
+        n_coarse = n_grid//stride
+        window = band_window(f_grid, bands, b, freqs[-1])
+        if b == 0:
+            G = g
+        else:
+            # Start of the time window in which the windowed waveform of this band is supported.
+            t_start = epoch - time_to_merger(f_start, chirp_mass_min) - time_margin - leakage_factor/taper_width
+            n0 = int(np.floor(t_start/duration*n_grid)) % n_grid
+            block = y[:, (n0 + np.arange(n_coarse)) % n_grid]
+            k = np.arange(n_coarse)
+            G = stride*np.exp(-2j*np.pi*k*n0/n_coarse)*np.fft.fft(block, axis=-1)
+
+        E = np.zeros((len(data), n_coarse + 1))
+        lower = data_index//stride
+        fraction = (data_index % stride)/stride
+        np.add.at(E, (slice(None), lower), (1 - fraction)*window[data_index]*optimal_weight)
+        np.add.at(E, (slice(None), lower + 1), fraction*window[data_index]*optimal_weight)
+        E = E[:, :n_coarse]
+
+        nodes = np.where((window[::stride] > 0) | np.any(E != 0, axis=0))[0]
+        node_list.append(nodes*stride)
+        D_list.append(window[nodes*stride]*G[:, nodes])
+        E_list.append(E[:, nodes])
+
+    # Bands overlap in their tapers, merge the nodes they share.
+    node_index, inverse = np.unique(np.concatenate(node_list), return_inverse=True)
+    D = np.zeros((len(data), len(node_index)), dtype=complex)
+    E = np.zeros((len(data), len(node_index)))
+    np.add.at(D, (slice(None), inverse), np.concatenate(D_list, axis=-1))
+    np.add.at(E, (slice(None), inverse), np.concatenate(E_list, axis=-1))
+    return {
+        'f_nodes': jnp.array(node_index*df),
+        'D': jnp.array(D),
+        'E': jnp.array(E),
+    }
+
+def make_multiband_kernel(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref):
+    """
+    Make the multibanded log-likelihood for a stack of detectors.
+    The waveform model is evaluated once per call, on the node frequencies only.
+
+    Returns:
+        A function multiband_kernel(params, state), where state is the output of make_multiband_state.
+    """
+    def multiband_kernel(params, state):
+        f = state['f_nodes']
+        theta_waveform = jnp.where(jnp.arange(params.shape[-1]) == 5, 0., params)
+        hp, hc = h_function(f, theta_waveform, f_ref)
+        ra, dec, psi = params[9], params[10], params[8]
+        antenna_plus, antenna_cross = antenna_pattern(detector_tensors, ra, dec, gmst, psi)
+        time = epoch + params[5] + time_delay_geocentric_stacked(detector_vertices, ra, dec, gmst)
+        h = (antenna_plus[:, None]*hp + antenna_cross[:, None]*hc)*jnp.exp(-1j*2*jnp.pi*f*time[:, None])
+        match_filter_SNR = jnp.sum(jnp.conj(h)*state['D']).real
+        optimal_SNR = jnp.sum(state['E']*jnp.abs(h)**2)
+        return match_filter_SNR - optimal_SNR/2
+
+    return multiband_kernel
+
+def make_multiband_likelihood(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, chirp_mass_min, time_margin=0.2, taper_factor=64., leakage_factor=8.):
+    """
+    Full-resolution likelihood of a stack of detectors, evaluated with multibanding.
+    Unlike the heterodyne likelihood it does not depend on a reference point, so it can be used to check it.
+
+    Returns:
+        A function multiband_likelihood(params) with the same parameter layout as the heterodyne likelihood.
+    """
+    state = make_multiband_state(data_list, psd_list, freqs, epoch, chirp_mass_min, time_margin, taper_factor, leakage_factor)
+    multiband_kernel = make_multiband_kernel(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+
+    def multiband_likelihood(params):
+        return multiband_kernel(params, state)
+
+    return multiband_likelihood
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import jax.numpy as jnp
+
+from jimgw.PE.multibandLikelihood import make_multiband_kernel
+from jimgw.PE.utils import quadrature_weights
+
+def load_roq_basis(basis_dir):
+    """
+    Load the linear and quadratic empirical interpolation bases of a reduced order quadrature.
+
+    The directory must contain B_linear.npy and B_quadratic.npy, with shapes (n_linear, n_freq) and
+    (n_quadratic, n_freq) on the frequency grid of the data, and fnodes_linear.npy and fnodes_quadratic.npy
+    with the empirical interpolation nodes. The bases have to span waveforms time shifted over the tc prior,
+    the epoch of the data segment is taken out of the data.
+
+    Returns:
+        A dictionary with the arrays 'B_linear', 'fnodes_linear', 'B_quadratic' and 'fnodes_quadratic'.
+    """
+    basis = {}
+    for name in ['B_linear', 'fnodes_linear', 'B_quadratic', 'fnodes_quadratic']:
+        basis[name] = np.load(os.path.join(basis_dir, name + '.npy'))
+    return basis
+
+def make_roq_state(data_list, psd_list, freqs, epoch, basis):
+    """
+    Build the reduced order quadrature weights for a stack of detectors.
+
+    The linear weights are sum_f 4 df conj(B_linear) d/S and the quadratic weights are sum_f 4 df B_quadratic/S,
+    for all detectors at once. df is given by jimgw.PE.utils.quadrature_weights, so the bases may be
+    defined on a nonuniform grid. Both are put on the union of the linear and quadratic nodes, so the waveform
+    is evaluated once per likelihood call.
+
+    Args:
+        data_list: List of frequency domain data, one per detector.
+        psd_list: List of PSDs, one per detector.
+        freqs: Frequency grid of the data and the bases, which does not have to be uniform.
+        epoch: Epoch of the data segment.
+        basis: Output of load_roq_basis.
+
+    Returns:
+        A dictionary with the node frequencies 'f_nodes' of shape (n_nodes,), and the matched filter
+        weights 'D' and optimal SNR weights 'E' of shape (n_det, n_nodes), as for make_multiband_state.
+    """
+    freqs = np.asarray(freqs)
+    for name in ['B_linear', 'B_quadratic']:
+        if basis[name].shape[-1] != len(freqs):
+            raise ValueError("{} has {} frequencies, but the data has {}".format(name, basis[name].shape[-1], len(freqs)))
+    df = np.asarray(quadrature_weights(freqs))
+    # The bases cover short time shifts around the merger, so the epoch is taken out of the data.
+    data = np.stack([np.asarray(data) for data in data_list])*np.exp(1j*2*np.pi*freqs*epoch)
+    psd = np.stack([np.asarray(psd) for psd in psd_list])
+
+    # The quadrature weights belong to the frequencies, so they go inside the sums over f.
+    linear_weights = np.einsum('kf,df->dk', np.conj(basis['B_linear']), 4*df*data/psd)
+    quadratic_weights = np.einsum('kf,df->dk', basis['B_quadratic'], 4*df/psd).real
+
+    fnodes_linear = np.asarray(basis['fnodes_linear'])
+    fnodes_quadratic = np.asarray(basis['fnodes_quadratic'])
+    f_nodes, inverse = np.unique(np.concatenate([fnodes_linear, fnodes_quadratic]), return_inverse=True)
+    D = np.zeros((len(data), len(f_nodes)), dtype=complex)
+    E = np.zeros((len(data), len(f_nodes)))
+    np.add.at(D, (slice(None), inverse[:len(fnodes_linear)]), linear_weights)
+    np.add.at(E, (slice(None), inverse[len(fnodes_linear):]), quadratic_weights)
+    # The kernel applies the epoch time shift to the waveform, put it back in the weights.
+    D = D*np.exp(-1j*2*np.pi*f_nodes*epoch)
+    return {
+        'f_nodes': jnp.array(f_nodes),
+        'D': jnp.array(D),
+        'E': jnp.array(E),
+    }
+
+def make_roq_likelihood(data_list, psd_list, detector_tensors, detector_vertices, h_function, freqs, gmst, epoch, f_ref, basis):
+    """
+    Reduced order quadrature likelihood of a stack of detectors. Its accuracy is set by the bases,
+    and does not depend on a reference point. Both the ROQ and the multibanding likelihoods are
+    weighted sums over waveform values at nodes, so they share make_multiband_kernel.
+
+    Returns:
+        A function roq_likelihood(params) with the same parameter layout as the heterodyne likelihood.
+    """
+    state = make_roq_state(data_list, psd_list, freqs, epoch, basis)
+    roq_kernel = make_multiband_kernel(detector_tensors, detector_vertices, h_function, gmst, epoch, f_ref)
+
+    def roq_likelihood(params):
+        return roq_kernel(params, state)
+
+    return roq_likelihood
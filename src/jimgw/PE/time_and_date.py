@@ -1,38 +1,104 @@
-import jax.numpy as np
-
-  {2444239.5,    -43200, 19},  /* 1980-Jan-01 */
-  {2444786.5,  46828800, 20},  /* 1981-Jul-01 */
-  {2445151.5,  78364801, 21},  /* 1982-Jul-01 */
-  {2445516.5, 109900802, 22},  /* 1983-Jul-01 */
-  {2446247.5, 173059203, 23},  /* 1985-Jul-01 */
-#if 0
-  /* NOTE: IF THIS WERE A NEGATIVE LEAP SECOND, INSERT AS FOLLOWS */
-  {2447161.5, 252028803, 22},  /* 1988-Jan-01 EXAMPLE ONLY! */
-#endif
-  {2447161.5, 252028804, 24},  /* 1988-Jan-01 */
-  {2447892.5, 315187205, 25},  /* 1990-Jan-01 */
-  {2448257.5, 346723206, 26},  /* 1991-Jan-01 */
-  {2448804.5, 393984007, 27},  /* 1992-Jul-01 */
-  {2449169.5, 425520008, 28},  /* 1993-Jul-01 */
-  {2449534.5, 457056009, 29},  /* 1994-Jul-01 */
-  {2450083.5, 504489610, 30},  /* 1996-Jan-01 */
-  {2450630.5, 551750411, 31},  /* 1997-Jul-01 */
-  {2451179.5, 599184012, 32},  /* 1999-Jan-01 */
-  {2453736.5, 820108813, 33},  /* 2006-Jan-01 */
-  {2454832.5, 914803214, 34},  /* 2009-Jan-01 */
-  {2456109.5, 1025136015, 35}, /* 2012-Jul-01 */
-  {2457204.5, 1119744016, 36}, /* 2015-Jul-01 */
-  {2457754.5, 1167264017, 37}, /* 2017-Jan-01 */
+import jax
+import jax.numpy as jnp
+jax.config.update('jax_enable_x64', True)
+
+from jimgw.PE.detector_projection import time_delay_geocentric as time_delay_geocentric_gmst
+
+# Leap second table from LAL's XLALDate.c: Julian day, GPS time and TAI-UTC at which each leap second takes effect.
+leap_second_table = jnp.array([
+    [2444239.5,    -43200, 19],  # 1980-Jan-01
+    [2444786.5,  46828800, 20],  # 1981-Jul-01
+    [2445151.5,  78364801, 21],  # 1982-Jul-01
+    [2445516.5, 109900802, 22],  # 1983-Jul-01
+    [2446247.5, 173059203, 23],  # 1985-Jul-01
+    [2447161.5, 252028804, 24],  # 1988-Jan-01
+    [2447892.5, 315187205, 25],  # 1990-Jan-01
+    [2448257.5, 346723206, 26],  # 1991-Jan-01
+    [2448804.5, 393984007, 27],  # 1992-Jul-01
+    [2449169.5, 425520008, 28],  # 1993-Jul-01
+    [2449534.5, 457056009, 29],  # 1994-Jul-01
+    [2450083.5, 504489610, 30],  # 1996-Jan-01
+    [2450630.5, 551750411, 31],  # 1997-Jul-01
+    [2451179.5, 599184012, 32],  # 1999-Jan-01
+    [2453736.5, 820108813, 33],  # 2006-Jan-01
+    [2454832.5, 914803214, 34],  # 2009-Jan-01
+    [2456109.5, 1025136015, 35], # 2012-Jul-01
+    [2457204.5, 1119744016, 36], # 2015-Jul-01
+    [2457754.5, 1167264017, 37], # 2017-Jan-01
+])
+leap_second_gps = leap_second_table[:, 1]
+leap_second_tai_utc = leap_second_table[:, 2]
+
+# TAI-GPS is fixed at the value of TAI-UTC at the GPS epoch.
+tai_gps = 19
+gps_epoch_jd = 2444244.5  # 1980-Jan-06 00:00:00 UTC
+j2000_jd = 2451545.0  # 2000-Jan-01 12:00:00 UTC
+
+
+def leap_seconds(gps_time):
+    """
+    Number of leap seconds between GPS and UTC (GPS-UTC) at the given GPS times.
+    Only valid after 1980-Jan-01.
+
+    Args:
+        gps_time: GPS time in seconds, scalar or array.
+
+    Returns:
+        GPS-UTC in seconds, with the same shape as gps_time.
+    """
+    gps_time = jnp.asarray(gps_time)
+    index = jnp.searchsorted(leap_second_gps, jnp.floor(gps_time), side='right') - 1
+    return leap_second_tai_utc[jnp.clip(index, 0)] - tai_gps
 
 
 def gps_to_utc(gps_time):
+    """
+    Convert GPS time to UTC.
+
+    Args:
+        gps_time: GPS time in seconds, scalar or array.
+
+    Returns:
+        UTC time in seconds since the GPS epoch (1980-Jan-06 00:00:00 UTC), not counting leap seconds.
+        During a leap second, the following second is returned, as LAL does.
+    """
+    gps_time = jnp.asarray(gps_time)
+    in_leap_second = jnp.any(jnp.floor(gps_time)[..., None] == leap_second_gps[1:], axis=-1)
+    return gps_time - leap_seconds(gps_time) + in_leap_second
+
 
 def greenwich_mean_sidereal_time(gps_time):
+    """
+    Greenwich mean sidereal time in radians, following XLALGreenwichMeanSiderealTime.
+    Jittable and vectorized over gps_time. As in LAL, the result is not wrapped to [0, 2pi).
 
-def time_delay_geocentric(detector1, detector2, ra, dec, time):
-    gmst = fmod(greenwich_mean_sidereal_time(time), 2 * np.pi)
-    theta, phi = ra_dec_to_theta_phi(ra, dec, gmst)
-    omega = np.array([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)])
-    delta_d = detector2 - detector1
-    return np.dot(omega, delta_d) / speed_of_light
+    Args:
+        gps_time: GPS time in seconds, scalar or array.
+
+    Returns:
+        GMST in radians, with the same shape as gps_time.
+    """
+    gps_time = jnp.asarray(gps_time, dtype=jnp.float64)
+    gps_seconds = jnp.floor(gps_time)
+    gps_fraction = gps_time - gps_seconds
 
+    # Like LAL, the Julian day only resolves integer seconds, the fraction is added to the least significant part.
+    utc_seconds = gps_to_utc(gps_seconds)
+    t_hi = (utc_seconds / 86400. + (gps_epoch_jd - j2000_jd)) / 36525.
+    t_lo = gps_fraction / (36525. * 86400.)
+    t = t_hi + t_lo
+
+    sidereal_time = (-6.2e-6 * t + 0.093104) * t * t + 67310.54841
+    sidereal_time += 8640184.812866 * t_lo
+    sidereal_time += 3155760000.0 * t_lo
+    sidereal_time += 8640184.812866 * t_hi
+    sidereal_time += 3155760000.0 * t_hi
+    return sidereal_time * jnp.pi / 43200.
+
+
+def time_delay_geocentric(detector1, detector2, ra, dec, time):
+    """
+    Same as jimgw.PE.detector_projection.time_delay_geocentric, but takes the GPS time instead of GMST.
+    """
+    gmst = jnp.mod(greenwich_mean_sidereal_time(time), 2 * jnp.pi)
+    return time_delay_geocentric_gmst(detector1, detector2, ra, dec, gmst)
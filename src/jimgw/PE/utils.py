@@ -1,15 +1,49 @@
 import jax.numpy as jnp
 from jax import jit
+from jimgw.PE.constants import Msun
 
 @jit
-def inner_product(h1, h2, frequency, PSD):
+def inner_product(h1, h2, frequency, PSD, weights=None):
 	"""
 	Do PSD interpolation outside the inner product loop to speed up the evaluation
+
+	Args:
+		weights: Quadrature weights of the frequency samples, e.g. from quadrature_weights.
+			If None, the trapezoidal rule on the frequency grid is used, as jnp.trapz, which does not have to be uniform.
+			Pass quadrature_weights(frequency) to weight the samples as make_frequency_domain_data does by default.
 	"""
 	#psd_interp = jnp.interp(frequency, PSD_frequency, PSD)
-	df = frequency[1] - frequency[0]
+	if weights is None:
+		weights = quadrature_weights(frequency, rule='trapezoid')
 	integrand = jnp.conj(h1)* h2 / PSD
-	return 4. * jnp.real(jnp.trapz(integrand,dx=df))
+	return 4. * jnp.real(jnp.sum(integrand*weights, axis=-1))
+
+def quadrature_weights(frequency, rule='midpoint'):
+	"""
+	Integration weights of a sorted, possibly nonuniform frequency grid, such as a masked, decimated
+	or multibanded grid, so that sum(weights*f(frequency)) approximates the integral of f.
+
+	Args:
+		frequency: Sorted frequency grid.
+		rule: 'midpoint' gives every sample the width of the cell between the midpoints to its neighbours,
+			with symmetric cells at the ends, which is df on a uniform grid as in the sums of the likelihoods.
+			It is the default of make_frequency_domain_data.
+			'trapezoid' gives the weights of the trapezoidal rule, as jnp.trapz, which halves the end samples.
+			It is the default of inner_product.
+
+	Returns:
+		Weights with the same shape as frequency.
+	"""
+	frequency = jnp.asarray(frequency)
+	spacing = jnp.diff(frequency)
+	lower = jnp.concatenate([spacing[:1], spacing])
+	upper = jnp.concatenate([spacing, spacing[-1:]])
+	if rule == 'midpoint':
+		return (lower + upper)/2
+	elif rule == 'trapezoid':
+		return (jnp.concatenate([jnp.zeros(1), spacing]) + jnp.concatenate([spacing, jnp.zeros(1)]))/2
+	else:
+		raise ValueError("Unknown quadrature rule {}".format(rule))
 
 @jit
 def m1m2_to_Mq(m1,m2):
@@ -49,3 +83,16 @@ def ra_dec_to_theta_phi(ra, dec, gmst):
     theta = jnp.pi / 2 - dec
     return theta, phi
 
+
+def time_to_merger(f, chirp_mass):
+    """
+    Leading order post-Newtonian time to merger of a binary at gravitational wave frequency f.
+
+    Args:
+        f: Frequency in Hz.
+        chirp_mass: Chirp mass in solar masses.
+
+    Returns:
+        Time to merger in seconds.
+    """
+    return 5./256*(chirp_mass*Msun)**(-5./3)*(jnp.pi*f)**(-8./3)
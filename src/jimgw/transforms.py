@@ -0,0 +1,120 @@
+import jax.numpy as jnp
+
+# A column transform is a dictionary with the names of the sampling and physical parameter,
+# 'sampling_name' and 'physical_name', and elementwise functions 'forward' (sampling to physical),
+# 'inverse' (physical to sampling) and 'log_jacobian', the log of |d physical/d sampling| at the sampling value.
+
+def make_identity_transform(name):
+    """
+    Parameter sampled as is.
+    """
+    return {
+        'sampling_name': name,
+        'physical_name': name,
+        'forward': lambda x: x,
+        'inverse': lambda y: y,
+        'log_jacobian': lambda x: jnp.zeros_like(x),
+    }
+
+def make_mass_ratio_transform(sampling_name='q', physical_name='eta'):
+    """
+    Mass ratio q = m2/m1 <= 1 to symmetric mass ratio eta = q/(1+q)^2.
+    The Jacobian vanishes at q = 1, where eta is maximal.
+    """
+    return {
+        'sampling_name': sampling_name,
+        'physical_name': physical_name,
+        'forward': lambda q: q/(1+q)**2,
+        'inverse': lambda eta: (1 - 2*eta - jnp.sqrt(jnp.maximum(1 - 4*eta, 0.)))/(2*eta),
+        'log_jacobian': lambda q: jnp.log(1 - q) - 3*jnp.log1p(q),
+    }
+
+def make_cosine_transform(sampling_name='cos_iota', physical_name='iota'):
+    """
+    cos(x) to x in [0, pi], e.g. for the inclination.
+    """
+    return {
+        'sampling_name': sampling_name,
+        'physical_name': physical_name,
+        'forward': jnp.arccos,
+        'inverse': jnp.cos,
+        'log_jacobian': lambda x: -0.5*jnp.log1p(-x**2),
+    }
+
+def make_sine_transform(sampling_name='sin_dec', physical_name='dec'):
+    """
+    sin(x) to x in [-pi/2, pi/2], e.g. for the declination.
+    """
+    return {
+        'sampling_name': sampling_name,
+        'physical_name': physical_name,
+        'forward': jnp.arcsin,
+        'inverse': jnp.sin,
+        'log_jacobian': lambda x: -0.5*jnp.log1p(-x**2),
+    }
+
+def make_transform_pipeline(transforms):
+    """
+    Combine one column transform per parameter into a bijection between sampling and physical parameters.
+
+    The columns are transformed independently and stacked back together, so the pipeline works on arrays
+    of shape (..., n_dim), e.g. (n_chains, n_dim) during sampling or (n_chains, n_steps, n_dim) for the
+    chains afterwards, without any scatter update.
+
+    Args:
+        transforms: List of column transforms, in the order of the parameters.
+
+    Returns:
+        A dictionary with the parameter names 'sampling_names' and 'physical_names', and the functions
+        'forward', 'inverse' and 'log_jacobian'. log_jacobian returns log |d physical/d sampling| summed over
+        the parameters, with shape (...), to be added to the log density of a prior defined on the physical parameters.
+    """
+    def forward(x):
+        return jnp.stack([transform['forward'](x[..., i]) for i, transform in enumerate(transforms)], axis=-1)
+
+    def inverse(y):
+        return jnp.stack([transform['inverse'](y[..., i]) for i, transform in enumerate(transforms)], axis=-1)
+
+    def log_jacobian(x):
+        return sum(transform['log_jacobian'](x[..., i]) for i, transform in enumerate(transforms))
+
+    return {
+        'sampling_names': [transform['sampling_name'] for transform in transforms],
+        'physical_names': [transform['physical_name'] for transform in transforms],
+        'forward': forward,
+        'inverse': inverse,
+        'log_jacobian': log_jacobian,
+    }
+
+def make_default_transform():
+    """
+    Pipeline of the examples, sampling in (Mc, q, chi1, chi2, dist_mpc, tc, phic, cos_iota, psi, ra, sin_dec)
+    and returning the parameters of the likelihoods, (Mc, eta, chi1, chi2, dist_mpc, tc, phic, iota, psi, ra, dec).
+    """
+    return make_transform_pipeline([
+        make_identity_transform('Mc'),
+        make_mass_ratio_transform('q', 'eta'),
+        make_identity_transform('chi1'),
+        make_identity_transform('chi2'),
+        make_identity_transform('dist_mpc'),
+        make_identity_transform('tc'),
+        make_identity_transform('phic'),
+        make_cosine_transform('cos_iota', 'iota'),
+        make_identity_transform('psi'),
+        make_identity_transform('ra'),
+        make_sine_transform('sin_dec', 'dec'),
+    ])
+
+def transform_chains(pipeline, chains):
+    """
+    Convert chains in the sampling parameters to a dictionary of physical parameters.
+
+    Args:
+        pipeline: Output of make_transform_pipeline.
+        chains: Array of shape (..., n_dim) in the sampling parameters.
+
+    Returns:
+        A dictionary mapping the physical parameter names to arrays of shape (...).
+    """
+    physical = pipeline['forward'](chains)
+    return {name: physical[..., i] for i, name in enumerate(pipeline['physical_names'])}
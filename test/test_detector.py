@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import jax
+import jax.numpy as jnp
+
+jax.config.update('jax_enable_x64', True)
+
+from jimgw.PE import detector_preset
+from jimgw.PE.detector_preset import get_H1, get_L1, get_detector, get_detector_array, add_detector
+from jimgw.PE.detector_projection import antenna_pattern, time_delay_geocentric_stacked, make_antenna_response, time_delay_geocentric, make_stacked_detector_response, make_rotating_detector_response
+from jimgw.PE.constants import earth_angular_velocity
+
+
+def test_detector_array_stacks_presets():
+    tensors, vertices = get_detector_array(['H1', 'L1'])
+    assert tensors.shape == (2, 3, 3)
+    assert vertices.shape == (2, 3)
+    assert np.array_equal(tensors[0], get_H1()[0])
+    assert np.array_equal(vertices[1], get_L1()[1])
+    assert get_detector_array(['H1', 'L1'])[0] is tensors
+
+
+@pytest.mark.parametrize('name', ['H1', 'K1', 'E1', 'E2', 'E3'])
+def test_detector_geometry_matches_lal(name):
+    lal = pytest.importorskip('lal')
+    tensor, vertex = get_detector(name)
+    detector = lal.cached_detector_by_prefix[name]
+    assert np.allclose(tensor, detector.response, atol=1e-6)
+    assert np.allclose(vertex, detector.location, atol=1e-3)
+
+
+def test_add_detector():
+    tensors, _ = get_detector_array(['H1', 'L1'])
+    add_detector('X1', 10., 20., 30., 120., elevation=100.)
+    try:
+        tensor, vertex = get_detector('X1')
+        assert np.allclose(tensor, tensor.T)
+        assert np.isclose(jnp.trace(tensor), 0.)
+        assert get_detector_array(['H1', 'L1'])[0] is not tensors
+    finally:
+        detector_preset.detector_parameters.pop('X1')
+
+
+def test_antenna_pattern_matches_single_detector_kernels():
+    names = ['H1', 'L1', 'V1', 'K1']
+    tensors, vertices = get_detector_array(names)
+    key = jax.random.PRNGKey(0)
+    ra, dec, gmst, psi = jax.random.uniform(key, (4, 64))*jnp.array([[2*jnp.pi], [jnp.pi], [2*jnp.pi], [jnp.pi]]) - jnp.array([[0.], [jnp.pi/2], [0.], [0.]])
+    antenna_plus, antenna_cross = jax.vmap(antenna_pattern, in_axes=(None, 0, 0, 0, 0))(tensors, ra, dec, gmst, psi)
+    time_delay = jax.vmap(time_delay_geocentric_stacked, in_axes=(None, 0, 0, 0))(vertices, ra, dec, gmst)
+    assert antenna_plus.shape == (64, 4)
+    for i, name in enumerate(names):
+        tensor, vertex = get_detector(name)
+        expected_plus = jax.vmap(make_antenna_response(tensor, 'plus'))(ra, dec, gmst, psi)
+        expected_cross = jax.vmap(make_antenna_response(tensor, 'cross'))(ra, dec, gmst, psi)
+        expected_delay = jax.vmap(time_delay_geocentric, in_axes=(None, None, 0, 0, 0))(vertex, jnp.zeros(3), ra, dec, gmst)
+        assert np.allclose(antenna_plus[:, i], expected_plus, atol=1e-12)
+        assert np.allclose(antenna_cross[:, i], expected_cross, atol=1e-12)
+        assert np.allclose(time_delay[:, i], expected_delay, atol=1e-15)
+
+
+def test_rotating_response_follows_sidereal_time():
+    tensors, vertices = get_detector_array(['H1', 'L1', 'V1'])
+    static_response = make_stacked_detector_response(tensors, vertices)
+    rotating_response = make_rotating_detector_response(tensors, vertices)
+    f = jnp.linspace(20, 200, 50)
+    hp, hc = jnp.exp(1j*f), 0.5j*jnp.exp(1j*f)
+    ra, dec, gmst, psi = 1.3, -0.5, 2.1, 0.3
+
+    result = rotating_response(f, hp, hc, ra, dec, gmst, psi, jnp.zeros_like(f))
+    assert result.shape == (3, len(f))
+    assert np.allclose(result, static_response(f, hp, hc, ra, dec, gmst, psi), rtol=1e-12)
+
+    # Every frequency sees the detector at the sidereal time at which it was emitted.
+    tau = jnp.linspace(3600., 0., len(f))
+    result = rotating_response(f, hp, hc, ra, dec, gmst, psi, tau)
+    for i in [0, 25, 49]:
+        expected = static_response(f[i:i+1], hp[i:i+1], hc[i:i+1], ra, dec, gmst - earth_angular_velocity*tau[i], psi)
+        assert np.allclose(result[:, i], expected[:, 0], rtol=1e-12)
+    assert not np.allclose(result[:, 0], static_response(f, hp, hc, ra, dec, gmst, psi)[:, 0], rtol=1e-3)
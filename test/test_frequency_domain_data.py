@@ -0,0 +1,66 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+
+from jimgw.PE.frequency_domain_data import make_frequency_domain_data, match_filter_snr, optimal_snr, make_full_likelihood, make_polarization_basis_likelihood
+from jimgw.PE.utils import inner_product, quadrature_weights
+
+from test.toy_model import gen_toy_polar, make_toy_event, true_param, dense_likelihood
+
+
+def test_inner_products_match_psd_division():
+    freqs, data_list, psd_list, _, _, _, _, _ = make_toy_event()
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    h = jnp.stack([gen_toy_polar(freqs, true_param, 30.)[0]*(i+1) for i in range(3)])
+    df = freqs[1] - freqs[0]
+    expected_match = sum(4*jnp.sum(jnp.conj(h[i])*data_list[i]/psd_list[i])*df for i in range(3))
+    expected_optimal = sum(4*jnp.sum(jnp.abs(h[i])**2/psd_list[i])*df for i in range(3))
+    assert np.isclose(match_filter_snr(h, frequency_domain_data), expected_match, rtol=1e-12)
+    assert np.isclose(optimal_snr(h, frequency_domain_data), expected_optimal, rtol=1e-12)
+
+
+def test_full_likelihood_matches_dense_likelihood():
+    event = make_toy_event()
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    logL = make_full_likelihood(frequency_domain_data, detector_tensors, detector_vertices, gen_toy_polar, gmst, epoch, f_ref)
+    for params in [true_param, true_param.at[9].add(0.1).at[5].add(0.001)]:
+        assert np.isclose(logL(params), dense_likelihood(params, *event), rtol=1e-10)
+
+
+def test_polarization_basis_matches_full_likelihood():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    logL = make_full_likelihood(frequency_domain_data, detector_tensors, detector_vertices, gen_toy_polar, gmst, epoch, f_ref)
+    logL_polarization = make_polarization_basis_likelihood(frequency_domain_data, detector_tensors, detector_vertices, gen_toy_polar, gmst, epoch, f_ref)
+    params = true_param*(1+1e-3*jax.random.normal(jax.random.PRNGKey(0), (8, len(true_param))))
+    assert np.allclose(jax.vmap(logL_polarization)(params), jax.vmap(logL)(params), rtol=1e-10)
+
+
+def test_quadrature_weights_on_nonuniform_grid():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    df = freqs[1] - freqs[0]
+    assert np.allclose(quadrature_weights(freqs), df, rtol=1e-12)
+
+    h = gen_toy_polar(freqs, true_param, f_ref)[0]
+    # inner_product defaults to the trapezoidal rule, and matches the frequency domain data when given its weights.
+    expected = 4*jnp.real(jax.scipy.integrate.trapezoid(jnp.conj(h)*data_list[0]/psd_list[0], dx=df))
+    assert np.isclose(inner_product(h, data_list[0], freqs, psd_list[0]), expected, rtol=1e-12)
+    frequency_domain_data = make_frequency_domain_data(data_list[:1], psd_list[:1], freqs)
+    assert np.isclose(inner_product(h, data_list[0], freqs, psd_list[0], quadrature_weights(freqs)), match_filter_snr(h[None], frequency_domain_data).real, rtol=1e-12)
+
+    # A grid that gets coarser with frequency, as for a decimated or multibanded grid.
+    f = jnp.geomspace(20., 512., 4000)
+    g = jnp.exp(-f/100.)
+    exact = 100.*(jnp.exp(-0.2) - jnp.exp(-5.12))
+    for rule in ['midpoint', 'trapezoid']:
+        weights = quadrature_weights(f, rule=rule)
+        assert np.isclose(jnp.sum(weights*g), exact, rtol=1e-3)
+    assert np.isclose(inner_product(g, g, f, 4*jnp.ones_like(f)), 100./2*(jnp.exp(-0.4) - jnp.exp(-10.24)), rtol=1e-5)
+
+    # Dropping samples and putting their weight on the neighbours keeps the optimal SNR consistent, up to the cutoff of the toy waveform.
+    projected = jnp.stack([gen_toy_polar(freqs, true_param, f_ref)[0]]*len(data_list))
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    mask = np.sort(np.random.default_rng(0).choice(len(freqs), len(freqs)//4, replace=False))
+    masked_data = make_frequency_domain_data([data[mask] for data in data_list], [psd[mask] for psd in psd_list], freqs[mask])
+    assert np.isclose(optimal_snr(projected[:, mask], masked_data), optimal_snr(projected, frequency_domain_data), rtol=5e-2)
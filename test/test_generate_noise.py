@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+lalsim = pytest.importorskip('lalsimulation')
+
+from jimgw.PE import generate_noise as noise_module
+from jimgw.PE.generate_noise import generate_noise, generate_noise_batch, compute_psd, get_psd, clear_psd_cache, psd_func_dict
+
+
+@pytest.mark.parametrize('ifo', ['H1', 'V1'])
+def test_get_psd_matches_pointwise(ifo):
+    f_sampling, duration, f_min = 2048, 4, 30.
+    freqs = np.fft.rfftfreq(f_sampling*duration, 1./f_sampling)
+    expected = np.zeros(len(freqs))
+    for i, f in enumerate(freqs):
+        if f >= f_min:
+            expected[i] = psd_func_dict[ifo](f)
+        else:
+            psd_ref = psd_func_dict[ifo](f_min)
+            expected[i] = psd_ref + psd_ref*(f_min-f)*np.exp(-(f_min-f))/3
+    assert np.allclose(compute_psd(ifo, f_sampling, duration, f_min), expected, rtol=1e-10, atol=0)
+
+
+def test_generate_noise_shapes():
+    freqs, psd_dict, noise_dict = generate_noise(0, 2048, 4, 30., ['H1', 'L1'])
+    assert len(freqs) == 4097
+    for ifo in ['H1', 'L1']:
+        assert psd_dict[ifo].shape == freqs.shape
+        assert noise_dict[ifo].shape == freqs.shape
+
+
+def test_psd_cache(tmp_path, monkeypatch):
+    clear_psd_cache()
+    psd = get_psd('H1', 2048, 4, 30., cache_dir=str(tmp_path))
+    assert get_psd('H1', 2048, 4, 30.) is psd
+    assert len(list(tmp_path.glob('*.npy'))) == 1
+
+    # A fresh process only finds the file on disk.
+    clear_psd_cache()
+    monkeypatch.setattr(noise_module, 'compute_psd', None)
+    psd_disk = get_psd('H1', 2048, 4, 30., cache_dir=str(tmp_path))
+    assert isinstance(psd_disk, np.memmap)
+    assert np.array_equal(psd_disk, psd)
+    monkeypatch.undo()
+
+    monkeypatch.setattr(noise_module, 'psd_cache_size', 2)
+    for f_min in [20., 25., 30.]:
+        get_psd('V1', 2048, 4, f_min)
+    assert len(noise_module.psd_cache) == 2
+    assert ('SimNoisePSDAdvVirgo', 2048, 4., 20.) not in noise_module.psd_cache
+    clear_psd_cache()
+
+
+def test_generate_noise_batch_matches_generate_noise():
+    seeds = [3, 17, 42]
+    freqs, psd, noise = generate_noise_batch(seeds, 1024, 4, 20., ['H1', 'L1', 'V1'])
+    assert noise.shape == (3, 3, len(freqs))
+    for i, seed in enumerate(seeds):
+        _, psd_dict, noise_dict = generate_noise(seed, 1024, 4, 20., ['H1', 'L1', 'V1'])
+        for j, ifo in enumerate(['H1', 'L1', 'V1']):
+            assert np.array_equal(psd[j], psd_dict[ifo])
+            assert np.allclose(noise[i, j], noise_dict[ifo], rtol=1e-12, atol=0)
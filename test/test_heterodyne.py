@@ -0,0 +1,210 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+
+from jimgw.PE.heterodyneLikelihood import make_heterodyne_state, max_phase_diff, get_n_bins, make_binning_scheme, compute_coefficients, make_heterodyne_likelihood_mutliple_detector, make_heterodyne_likelihood_stacked_detector, make_heterodyne_likelihood_batched, find_reference_parameters, make_adaptive_heterodyne_likelihood, log_i0, make_heterodyne_likelihood_phase_marginalized, make_phase_reconstruction
+from jimgw.PE.detector_projection import make_detector_response
+from jimgw.PE.detector_preset import get_H1
+
+from test.toy_model import gen_toy_polar, make_toy_event, true_param, dense_likelihood
+
+
+def compute_coefficients_loop(data, h_ref, psd, freqs, f_bins, f_bins_center):
+    # Reference implementation, one np.where scan per bin.
+    A0_array, A1_array, B0_array, B1_array = [], [], [], []
+    df = freqs[1] - freqs[0]
+    data_prod = np.array(data*h_ref.conj())
+    self_prod = np.array(h_ref*h_ref.conj())
+    for i in range(len(f_bins)-1):
+        f_index = np.where((freqs >= f_bins[i]) & (freqs < f_bins[i+1]))[0]
+        A0_array.append(4*np.sum(data_prod[f_index]/psd[f_index])*df)
+        A1_array.append(4*np.sum(data_prod[f_index]/psd[f_index]*(freqs[f_index]-f_bins_center[i]))*df)
+        B0_array.append(4*np.sum(self_prod[f_index]/psd[f_index])*df)
+        B1_array.append(4*np.sum(self_prod[f_index]/psd[f_index]*(freqs[f_index]-f_bins_center[i]))*df)
+    return np.array(A0_array), np.array(A1_array), np.array(B0_array), np.array(B1_array)
+
+
+def test_compute_coefficients_matches_loop():
+    freqs, data_list, psd_list, _, _, gmst, epoch, f_ref = make_toy_event(n_det=1)
+    freqs = np.array(freqs)
+    H1_response = make_detector_response(*get_H1())
+    hp, hc = gen_toy_polar(freqs, true_param, f_ref)
+    h_ref = H1_response(freqs, hp, hc, true_param[9], true_param[10], gmst, true_param[8])
+    f_bins, f_bins_center = make_binning_scheme(freqs, 101)
+    # Add bins outside the frequency grid so that some of them are empty.
+    f_bins = np.concatenate([f_bins, [freqs[-1]+1, freqs[-1]+2]])
+    f_bins_center = (f_bins[:-1] + f_bins[1:])/2
+
+    expected = compute_coefficients_loop(data_list[0], h_ref, psd_list[0], freqs, f_bins, f_bins_center)
+    result = compute_coefficients(data_list[0], h_ref, psd_list[0], freqs, f_bins, f_bins_center)
+    for e, r in zip(expected, result):
+        assert np.allclose(e, r, rtol=1e-10, atol=0)
+
+
+def test_compute_coefficients_detector_axis():
+    freqs, data_list, psd_list, _, _, _, _, _ = make_toy_event()
+    hp, _ = gen_toy_polar(freqs, true_param, 30.)
+    f_bins, f_bins_center = make_binning_scheme(np.array(freqs), 51)
+    stacked = compute_coefficients(jnp.stack(data_list), jnp.stack([hp]*3), jnp.stack(psd_list), freqs, f_bins, f_bins_center)
+    for i in range(3):
+        single = compute_coefficients(data_list[i], hp, psd_list[i], freqs, f_bins, f_bins_center)
+        for s, r in zip(stacked, single):
+            assert np.allclose(s[i], r, rtol=1e-12, atol=0)
+
+
+def test_stacked_detector_matches_detector_loop():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    response_list = [make_detector_response(detector_tensors[i], detector_vertices[i]) for i in range(3)]
+    ref_param = true_param*1.0005
+    logL = make_heterodyne_likelihood_mutliple_detector(list(data_list), list(psd_list), response_list, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    logL_stacked = make_heterodyne_likelihood_stacked_detector(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    for params in [true_param, ref_param, true_param.at[9].add(0.01)]:
+        assert np.isclose(logL(params), logL_stacked(params), rtol=1e-10)
+
+
+def test_batched_matches_vmapped_scalar():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    ref_param = true_param*1.0005
+    logL_stacked = make_heterodyne_likelihood_stacked_detector(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    logL_batched = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    params = true_param*(1+1e-3*jax.random.normal(jax.random.PRNGKey(1), (16, len(true_param))))
+    result = jax.jit(logL_batched)(params)
+    assert result.shape == (16,)
+    assert np.allclose(result, jax.vmap(logL_stacked)(params), rtol=1e-10)
+
+
+def test_concatenated_bins_single_waveform_call():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    n_calls = []
+    def counted_waveform(f, theta, f_ref):
+        n_calls.append(f.shape)
+        return gen_toy_polar(f, theta, f_ref)
+
+    ref_param = true_param*1.0005
+    params = true_param*(1+1e-3*jax.random.normal(jax.random.PRNGKey(2), (8, len(true_param))))
+    outputs = []
+    for concatenate_bins, expected_calls in [(True, 1), (False, 2)]:
+        logL_batched = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, counted_waveform, ref_param, freqs, gmst, epoch, f_ref, 101, concatenate_bins)
+        n_calls.clear()
+        outputs.append(jax.jit(logL_batched)(params))
+        assert len(n_calls) == expected_calls
+    assert np.allclose(outputs[0], outputs[1], rtol=1e-12)
+
+
+def test_binning_scheme_matches_interp1d():
+    from scipy.interpolate import interp1d
+    freqs = np.fft.rfftfreq(128*2048, 1./2048)
+    freqs = freqs[freqs > 20]
+    gamma = np.arange(-5,6,1)/3.
+    f = np.repeat(freqs[:,None],len(gamma),axis=1)
+    f_star = np.repeat(freqs[0], len(gamma))
+    f_star[gamma >= 0] = freqs[-1]
+    phase_diff_array = 2*np.pi*np.sum((f/f_star)**gamma*np.sign(gamma),axis=1)
+    expected = interp1d(phase_diff_array, freqs)(np.linspace(phase_diff_array[0], phase_diff_array[-1], 1001))
+
+    f_bins, f_bins_center = make_binning_scheme(freqs, 1001)
+    assert np.allclose(f_bins, expected, rtol=1e-12, atol=0)
+    assert np.allclose(f_bins_center, (expected[1:]+expected[:-1])/2, rtol=1e-12, atol=0)
+
+
+def test_binning_scheme_from_phase_error():
+    freqs = np.linspace(20, 1024, 100000)
+    for max_phase_error in [0.5, 0.05]:
+        f_bins, _ = make_binning_scheme(freqs, max_phase_error=max_phase_error)
+        assert len(f_bins) == get_n_bins(freqs, max_phase_error)
+        phase_diff = max_phase_diff(f_bins, freqs[0], freqs[-1])
+        assert np.all(np.diff(phase_diff) <= max_phase_error*(1+1e-6))
+
+
+def test_find_reference_parameters():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    prior_range = jnp.array([[29.5, 30.5], [0.2, 0.25], [-0.5, 0.5], [-0.5, 0.5], [100, 1000], [-0.05, 0.05], [0, 2*np.pi], [0, np.pi], [0, np.pi], [0, 2*np.pi], [-np.pi/2, np.pi/2]])
+    trial_param = true_param.at[0].add(0.05).at[4].set(200.).at[9].add(0.3)
+
+    def log_likelihood(ref_param):
+        logL = make_heterodyne_likelihood_stacked_detector(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+        return logL(ref_param)
+
+    ref_param, state = find_reference_parameters(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, trial_param, prior_range, freqs, gmst, epoch, f_ref, n_candidates=2000, n_refine=8, n_steps=100)
+    assert np.all((ref_param >= prior_range[:, 0]) & (ref_param <= prior_range[:, 1]))
+    assert set(state.keys()) == {'f_bins_low', 'f_bins_center', 'h_ref_low', 'h_ref_bincenter', 'A0', 'A1', 'B0', 'B1'}
+    assert log_likelihood(ref_param) > log_likelihood(trial_param)
+
+    # Without refinement the best coarse candidate is returned.
+    coarse_param, coarse_state = find_reference_parameters(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, trial_param, prior_range, freqs, gmst, epoch, f_ref, n_candidates=2000, n_iterations=0)
+    assert np.all((coarse_param >= prior_range[:, 0]) & (coarse_param <= prior_range[:, 1]))
+    assert log_likelihood(coarse_param) >= log_likelihood(trial_param) - 1e-6
+    assert coarse_state['A0'].shape == state['A0'].shape
+    assert log_likelihood(ref_param) > log_likelihood(true_param) - 5
+
+
+def test_adaptive_heterodyne_rebuilds_without_recompiling():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    n_traces = []
+    def counted_waveform(f, theta, f_ref):
+        n_traces.append(f.shape)
+        return gen_toy_polar(f, theta, f_ref)
+
+    poor_ref = true_param.at[0].add(0.02).at[9].add(0.2)
+    logL, state, update_state = make_adaptive_heterodyne_likelihood(list(data_list), list(psd_list), detector_tensors, detector_vertices, counted_waveform, poor_ref, freqs, gmst, epoch, f_ref, 101)
+    logL_jit = jax.jit(logL)
+    samples = true_param*(1+1e-5*jax.random.normal(jax.random.PRNGKey(3), (4, 8, len(true_param))))
+    logL_jit(samples[0], state)
+    n_traces.clear()
+
+    new_state, rebuilt = update_state(state, samples)
+    assert rebuilt
+    assert jax.tree_util.tree_all(jax.tree_util.tree_map(lambda a, b: a.shape == b.shape, state, new_state))
+    n_traces.clear()
+    logL_jit(samples[0], new_state)
+    assert len(n_traces) == 0
+
+    _, rebuilt = update_state(new_state, samples)
+    assert not rebuilt
+
+
+def test_log_i0():
+    from scipy.special import i0
+    x = np.array([0., 0.1, 1., 10., 100.])
+    assert np.allclose(log_i0(x), np.log(i0(x)), rtol=1e-12)
+    assert np.isfinite(log_i0(1e4))
+    assert np.isclose(log_i0(1e4), 1e4 - 0.5*np.log(2*np.pi*1e4), rtol=0, atol=1e-4)
+
+
+def test_phase_marginalized_matches_integral_over_phic():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    ref_param = true_param*1.0005
+    logL = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    logL_marginalized = make_heterodyne_likelihood_phase_marginalized(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 101)
+    phic = jnp.linspace(0, 2*np.pi, 2000, endpoint=False)
+    for params in [true_param, true_param.at[9].add(0.5)]:
+        log_likelihood = logL(jnp.tile(params, (len(phic), 1)).at[:, 6].set(phic))
+        expected = jax.scipy.special.logsumexp(log_likelihood) - np.log(len(phic))
+        assert np.isclose(logL_marginalized(params[None])[0], expected, rtol=1e-8)
+
+
+def test_phase_reconstruction_recovers_injection():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    state = make_heterodyne_state(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, true_param, freqs, gmst, epoch, f_ref)
+    sample_phase = make_phase_reconstruction(detector_tensors, detector_vertices, gen_toy_polar, gmst, epoch, f_ref)
+    phic = sample_phase(jax.random.PRNGKey(0), jnp.tile(true_param, (2000, 1)), state)
+    assert np.all((phic >= 0) & (phic < 2*np.pi))
+    # phic is only measured modulo pi, and both branches are drawn.
+    assert np.abs(np.median(np.mod(phic - true_param[6] + np.pi/2, np.pi) - np.pi/2)) < 0.1
+    assert 0.4 < np.mean(np.mod(phic - true_param[6] + np.pi/2, 2*np.pi) < np.pi) < 0.6
+
+
+def test_earth_rotation_matches_dense_rotating_likelihood():
+    # A low mass signal that lasts long enough for the Earth rotation to matter.
+    param = true_param.at[0].set(1.2).at[4].set(100.)
+    event = make_toy_event(duration=64, f_min=40., param=param)
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+
+    ref_param = param.at[0].mul(1+1e-6)
+    logL = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 1001, earth_rotation=True)
+    logL_static = make_heterodyne_likelihood_batched(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, ref_param, freqs, gmst, epoch, f_ref, 1001)
+    params = jnp.stack([param, param.at[9].add(0.01), param.at[0].mul(1+1e-6)])
+    expected = jax.vmap(lambda params: dense_likelihood(params, *event, earth_rotation=True))(params)
+    result = jax.jit(logL)(params)
+    assert np.allclose(result, expected, rtol=0, atol=1e-2)
+    assert np.max(np.abs(logL_static(params) - expected)) > 5*np.max(np.abs(result - expected))
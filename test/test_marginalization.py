@@ -0,0 +1,62 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+from jax.scipy.special import logsumexp
+
+from jimgw.PE.marginalizedLikelihood import make_time_series_kernel, make_time_marginalized_likelihood, make_time_reconstruction, make_snr_kernel, make_distance_marginalization_table, make_distance_marginalized_likelihood, make_distance_reconstruction
+from jimgw.PE.heterodyneLikelihood import make_heterodyne_state, make_heterodyne_snr_kernel_batched
+
+from test.toy_model import gen_toy_polar, make_toy_event, true_param, dense_likelihood
+
+
+def test_time_marginalized_matches_sum_over_tc():
+    event = make_toy_event()
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+    tc_range = (-0.01, 0.03)
+    tc_grid, _ = make_time_series_kernel(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, tc_range)
+    assert np.isclose(tc_grid[1] - tc_grid[0], 1./2048)
+    assert tc_grid[0] >= tc_range[0] and tc_grid[-1] <= tc_range[1]
+
+    logL = jax.jit(make_time_marginalized_likelihood(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, tc_range))
+    for params in [true_param, true_param.at[9].add(0.1).at[0].mul(1.001)]:
+        dense = jax.vmap(lambda tc: dense_likelihood(params.at[5].set(tc), *event))(jnp.array(tc_grid))
+        expected = logsumexp(dense) - np.log(len(tc_grid))
+        assert np.isclose(logL(params), expected, rtol=1e-10)
+        assert np.isclose(logL(params.at[5].set(0.5)), expected, rtol=1e-10)
+
+
+def test_time_reconstruction_recovers_injection():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    sample_time = make_time_reconstruction(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, (-0.1, 0.1))
+    keys = jax.random.split(jax.random.PRNGKey(0), 200)
+    tc = jax.vmap(sample_time, in_axes=(0, None))(keys, true_param)
+    assert np.abs(np.median(tc) - true_param[5]) < 2e-3
+
+
+def test_distance_marginalized_matches_integral():
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = make_toy_event()
+    distance_bounds = (50., 2000.)
+    snr_kernel = make_snr_kernel(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref)
+    table = make_distance_marginalization_table(lambda d: d**2, distance_bounds)
+    logL = jax.jit(make_distance_marginalized_likelihood(snr_kernel, table, distance_bounds))
+
+    distance = jnp.linspace(*distance_bounds, 400001)
+    for params in [true_param, true_param.at[0].mul(1.0005), true_param.at[9].add(1.)]:
+        match_filter_SNR, optimal_SNR = snr_kernel(params)
+        s = params[4]/distance
+        expected = logsumexp(2*jnp.log(distance) + s*match_filter_SNR.real - s**2*optimal_SNR/2) - logsumexp(2*jnp.log(distance))
+        assert np.isclose(logL(params), expected, rtol=0, atol=1e-2)
+        assert np.isclose(logL(params.at[4].set(1000.)), expected, rtol=0, atol=1e-2)
+
+    # The same table works with the batched heterodyne SNRs.
+    state = make_heterodyne_state(list(data_list), list(psd_list), detector_tensors, detector_vertices, gen_toy_polar, true_param, freqs, gmst, epoch, f_ref)
+    heterodyne_snr_kernel = make_heterodyne_snr_kernel_batched(detector_tensors, detector_vertices, gen_toy_polar, gmst, epoch, f_ref)
+    logL_heterodyne = make_distance_marginalized_likelihood(lambda params: heterodyne_snr_kernel(params, state), table, distance_bounds)
+    result = logL_heterodyne(jnp.stack([true_param, true_param.at[4].set(1000.)]))
+    assert result.shape == (2,)
+    assert np.isclose(result[0], result[1])
+
+    sample_distance = make_distance_reconstruction(snr_kernel, table, distance_bounds)
+    keys = jax.random.split(jax.random.PRNGKey(0), 1000)
+    distance_samples = jax.vmap(sample_distance, in_axes=(0, None))(keys, true_param)
+    assert np.percentile(distance_samples, 5) < true_param[4] < np.percentile(distance_samples, 95)
@@ -0,0 +1,31 @@
+import numpy as np
+import jax
+
+from jimgw.PE.multibandLikelihood import make_multiband_bands, band_window, make_multiband_state, make_multiband_likelihood
+
+from test.toy_model import gen_toy_polar, make_toy_event, true_param, dense_likelihood
+
+# A low mass signal that lasts for most of the segment and stays below its ISCO frequency.
+bns_param = true_param.at[0].set(1.2).at[4].set(100.)
+
+
+def test_band_windows_sum_to_one():
+    freqs = np.fft.rfftfreq(64*2048, 1./2048)
+    freqs = freqs[freqs > 40]
+    bands = make_multiband_bands(freqs, 1.1)
+    assert len(bands) > 1
+    assert all(bands[i][2] == 2**i for i in range(len(bands)))
+    total = sum(band_window(freqs, bands, b, freqs[-1]) for b in range(len(bands)))
+    assert np.allclose(total, 1, rtol=0, atol=1e-12)
+
+
+def test_multiband_matches_dense_likelihood():
+    event = make_toy_event(duration=64, f_min=40., param=bns_param)
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+    state = make_multiband_state(data_list, psd_list, freqs, epoch, 1.1)
+    assert len(state['f_nodes']) < len(freqs)/10
+
+    logL = jax.jit(make_multiband_likelihood(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, 1.1))
+    for params in [bns_param, bns_param.at[5].add(0.05), bns_param.at[0].mul(1.001), bns_param.at[9].add(0.3).at[6].add(1.)]:
+        expected = dense_likelihood(params, *event)
+        assert np.isclose(logL(params), expected, rtol=0, atol=1e-3)
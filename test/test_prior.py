@@ -0,0 +1,78 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+jax.config.update('jax_enable_x64', True)
+
+from jimgw.prior import make_uniform_prior, make_sine_prior, make_cosine_prior, make_comoving_volume_prior, make_component_mass_prior, make_composite_prior
+
+prior_range = jnp.array([[10,50],[0.5,1.0],[-0.5,0.5],[-0.5,0.5],[300,2000],[-0.5,0.5],[0,2*np.pi],[-1,1],[0,np.pi],[0,2*np.pi],[-1,1]])
+
+
+def test_composite_uniform_matches_top_hat():
+    # Same as the top_hat of the examples, up to the normalization.
+    def top_hat(x):
+        output = 0.
+        for i in range(len(prior_range)):
+            output = jax.lax.cond(x[i]>=prior_range[i,0], lambda: output, lambda: -jnp.inf)
+            output = jax.lax.cond(x[i]<=prior_range[i,1], lambda: output, lambda: -jnp.inf)
+        return output
+
+    prior = make_composite_prior([make_uniform_prior(prior_range[:4]), make_uniform_prior(prior_range[4]), make_uniform_prior(prior_range[5:])])
+    assert prior['bounds'].shape == prior_range.shape
+    x = prior['sample'](jax.random.PRNGKey(0), 200)
+    x = x.at[::3, 4].set(2500.).at[1::7, 1].set(0.4)
+    log_volume = jnp.sum(jnp.log(prior_range[:, 1] - prior_range[:, 0]))
+    log_prob = jax.jit(prior['log_prob'])(x)
+    assert np.allclose(log_prob, jax.vmap(top_hat)(x) - log_volume)
+    assert np.all(np.isfinite(jax.vmap(jax.grad(prior['log_prob']))(x)))
+
+
+def test_angle_priors():
+    key_sine, key_cosine = jax.random.split(jax.random.PRNGKey(1))
+    for make_prior, key, density in [(make_sine_prior, key_sine, np.sin), (make_cosine_prior, key_cosine, np.cos)]:
+        prior = make_prior()
+        bounds = np.asarray(prior['bounds'][0])
+        grid = np.linspace(bounds[0], bounds[1], 10001)
+        assert np.isclose(np.trapz(np.exp(prior['log_prob'](jnp.array(grid)[:, None])), grid), 1., rtol=1e-6)
+        samples = prior['sample'](key, 100000)
+        assert np.all((samples >= bounds[0]) & (samples <= bounds[1]))
+        mean = np.trapz(grid*density(grid), grid)/np.trapz(density(grid), grid)
+        assert np.isclose(np.mean(samples), mean, atol=0.02)
+
+
+def test_comoving_volume_prior():
+    from astropy.cosmology import Planck18
+
+    prior = make_comoving_volume_prior((100., 2000.))
+    distance = np.linspace(100., 2000., 3001)
+    density = np.exp(prior['log_prob'](jnp.array(distance)[:, None]))
+    assert np.isclose(np.trapz(density, distance), 1., rtol=1e-6)
+    # Compare the shape to a finite difference of the comoving volume.
+    z = np.interp(distance, Planck18.luminosity_distance(np.linspace(0, 1, 10001)).value, np.linspace(0, 1, 10001))
+    volume = Planck18.comoving_volume(z).value
+    expected = np.gradient(volume, distance)/(volume[-1] - volume[0])
+    assert np.allclose(density[1:-1], expected[1:-1], rtol=1e-4)
+
+    samples = prior['sample'](jax.random.PRNGKey(2), 100000)
+    assert np.isclose(np.mean(samples), np.trapz(distance*density, distance), rtol=5e-3)
+
+
+def test_component_mass_prior_is_uniform_in_component_masses():
+    from ripple import ms_to_Mc_eta
+
+    chirp_mass_bounds, mass_ratio_bounds = (10., 40.), (0.25, 1.)
+    prior = make_component_mass_prior(chirp_mass_bounds, mass_ratio_bounds)
+    samples = np.asarray(prior['sample'](jax.random.PRNGKey(3), 100000))
+    assert np.all((samples >= prior['bounds'][:, 0]) & (samples <= prior['bounds'][:, 1]))
+
+    # Rejection sampling uniform component masses into the box.
+    masses = np.sort(np.random.default_rng(0).uniform(5., 100., (2, 2000000)), axis=0)[::-1]
+    Mc = np.asarray(ms_to_Mc_eta(jnp.array(masses))[0])
+    q = masses[1]/masses[0]
+    keep = (Mc >= chirp_mass_bounds[0]) & (Mc <= chirp_mass_bounds[1]) & (q >= mass_ratio_bounds[0])
+    assert np.isclose(np.mean(samples[:, 0]), np.mean(Mc[keep]), rtol=1e-2)
+    assert np.isclose(np.mean(samples[:, 1]), np.mean(q[keep]), rtol=1e-2)
+
+    Mc_grid, q_grid = np.meshgrid(np.linspace(*chirp_mass_bounds, 401), np.linspace(*mass_ratio_bounds, 401), indexing='ij')
+    density = np.exp(prior['log_prob'](jnp.stack([Mc_grid, q_grid], axis=-1)))
+    assert np.isclose(np.trapz(np.trapz(density, q_grid[0], axis=1), Mc_grid[:, 0]), 1., rtol=1e-4)
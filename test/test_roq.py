@@ -0,0 +1,90 @@
+import numpy as np
+import jax
+import pytest
+
+from jimgw.PE.roqLikelihood import load_roq_basis, make_roq_state, make_roq_likelihood
+from jimgw.PE.frequency_domain_data import make_frequency_domain_data
+
+from test.toy_model import gen_toy_polar, make_toy_event, true_param, dense_likelihood
+
+
+def save_identity_basis(path, freqs):
+    # With the identity as basis and every frequency as node, the quadrature is exact.
+    np.save(path / 'B_linear.npy', np.eye(len(freqs), dtype=complex))
+    np.save(path / 'fnodes_linear.npy', freqs)
+    np.save(path / 'B_quadratic.npy', np.eye(len(freqs)))
+    np.save(path / 'fnodes_quadratic.npy', freqs)
+
+
+def make_reduced_basis(training_set, tolerance):
+    # Orthonormal basis from an SVD of the training set, and empirical interpolation nodes picked greedily
+    # where each new basis element is worst interpolated by the previous ones.
+    _, s, vh = np.linalg.svd(training_set, full_matrices=False)
+    basis = vh[s > tolerance*s[0]]
+    nodes = [np.argmax(np.abs(basis[0]))]
+    for i in range(1, len(basis)):
+        residual = basis[i] - np.linalg.solve(basis[:i, nodes].T, basis[i, nodes]) @ basis[:i]
+        nodes.append(np.argmax(np.abs(residual)))
+    return np.linalg.solve(basis[:, nodes], basis), np.array(nodes)
+
+
+def test_reduced_basis_matches_dense_likelihood(tmp_path):
+    event = make_toy_event()
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+    # The projected waveform is a complex multiple of h0 time shifted by tc and the detector delays,
+    # and its squared amplitude only depends on the masses, which move the cutoff of the toy waveform.
+    h0 = np.asarray(gen_toy_polar(freqs, true_param.at[5].set(0).at[7].set(0), f_ref)[0])
+    time_shifts = np.linspace(-0.04, 0.07, 221)
+    B_linear, nodes_linear = make_reduced_basis(h0*np.exp(-1j*2*np.pi*np.outer(time_shifts, freqs)), 1e-8)
+    amplitudes = np.stack([np.abs(gen_toy_polar(freqs, true_param.at[0].mul(scale).at[5].set(0), f_ref)[0])**2 for scale in np.linspace(0.95, 1.05, 41)])
+    B_quadratic, nodes_quadratic = make_reduced_basis(amplitudes, 1e-8)
+    assert len(B_linear) < len(freqs)/10 and len(B_quadratic) < len(freqs)/10
+    assert set(nodes_linear) != set(nodes_quadratic)
+    np.save(tmp_path / 'B_linear.npy', B_linear)
+    np.save(tmp_path / 'fnodes_linear.npy', freqs[nodes_linear])
+    np.save(tmp_path / 'B_quadratic.npy', B_quadratic.real)
+    np.save(tmp_path / 'fnodes_quadratic.npy', freqs[nodes_quadratic])
+
+    basis = load_roq_basis(tmp_path)
+    logL = jax.jit(make_roq_likelihood(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, basis))
+    for params in [true_param, true_param.at[5].add(0.01), true_param.at[9].add(0.3).at[6].add(1.), true_param.at[4].mul(2).at[7].add(0.5)]:
+        assert np.isclose(logL(params), dense_likelihood(params, *event), rtol=0, atol=1e-5)
+
+
+def test_identity_basis_matches_dense_likelihood(tmp_path):
+    event = make_toy_event(duration=1)
+    freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref = event
+    save_identity_basis(tmp_path, freqs)
+    basis = load_roq_basis(tmp_path)
+    state = make_roq_state(data_list, psd_list, freqs, epoch, basis)
+    assert state['D'].shape == state['E'].shape == (3, len(freqs))
+
+    logL = jax.jit(make_roq_likelihood(data_list, psd_list, detector_tensors, detector_vertices, gen_toy_polar, freqs, gmst, epoch, f_ref, basis))
+    for params in [true_param, true_param.at[5].add(0.01), true_param.at[9].add(0.3)]:
+        assert np.isclose(logL(params), dense_likelihood(params, *event), rtol=1e-10)
+
+
+def test_basis_smaller_than_grid_weights_each_frequency(tmp_path):
+    # Rows of the identity as bases, on a nonuniform grid and with fewer basis elements than frequencies,
+    # so the weights at the nodes are 4 df d/S and 4 df/S with the quadrature weight of their own frequency.
+    freqs, data_list, psd_list, _, _, _, epoch, _ = make_toy_event(duration=1)
+    keep = np.sort(np.random.default_rng(0).choice(len(freqs), len(freqs)//2, replace=False))
+    freqs, data_list, psd_list = freqs[keep], [data[keep] for data in data_list], [psd[keep] for psd in psd_list]
+    linear_index, quadratic_index = np.arange(0, len(freqs), 7), np.arange(3, len(freqs), 11)
+    np.save(tmp_path / 'B_linear.npy', np.eye(len(freqs), dtype=complex)[linear_index])
+    np.save(tmp_path / 'fnodes_linear.npy', freqs[linear_index])
+    np.save(tmp_path / 'B_quadratic.npy', np.eye(len(freqs))[quadratic_index])
+    np.save(tmp_path / 'fnodes_quadratic.npy', freqs[quadratic_index])
+    state = make_roq_state(data_list, psd_list, freqs, epoch, load_roq_basis(tmp_path))
+
+    frequency_domain_data = make_frequency_domain_data(data_list, psd_list, freqs)
+    f_nodes = np.asarray(state['f_nodes'])
+    assert np.allclose(state['D'][:, np.searchsorted(f_nodes, freqs[linear_index])], frequency_domain_data['weighted_data'][:, linear_index], rtol=1e-10)
+    assert np.allclose(state['E'][:, np.searchsorted(f_nodes, freqs[quadratic_index])], frequency_domain_data['weights'][:, quadratic_index], rtol=1e-10)
+
+
+def test_basis_frequency_mismatch(tmp_path):
+    freqs, data_list, psd_list, _, _, _, epoch, _ = make_toy_event(duration=1)
+    save_identity_basis(tmp_path, freqs[:-1])
+    with pytest.raises(ValueError):
+        make_roq_state(data_list, psd_list, freqs, epoch, load_roq_basis(tmp_path))
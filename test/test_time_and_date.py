@@ -0,0 +1,21 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+
+from jimgw.PE.time_and_date import greenwich_mean_sidereal_time, gps_to_utc, leap_seconds
+
+# Reference values from lal.GreenwichMeanSiderealTime. 1167264017 is the leap second at the end of 2016.
+gps_times = np.array([1126259462.4, 1187008882.43, 1167264017.0, 1167264018.0, 630720013.0])
+lal_gmst = np.array([36137.05523464343, 40566.97325177817, 39127.154862055206, 39127.154862055206, 1.7447671633306125])
+
+
+def test_leap_seconds():
+    assert np.array_equal(leap_seconds(jnp.array([0., 46828799., 46828800., 1126259462.4, 1187008882.43])), [0, 0, 1, 17, 18])
+    assert gps_to_utc(1167264017.) == gps_to_utc(1167264018.)
+
+
+def test_greenwich_mean_sidereal_time_matches_lal():
+    gmst = jax.jit(greenwich_mean_sidereal_time)(gps_times)
+    assert gmst.shape == gps_times.shape
+    assert np.allclose(gmst, lal_gmst, rtol=0, atol=1e-8)
+    assert np.allclose(jax.vmap(greenwich_mean_sidereal_time)(gps_times), gmst)
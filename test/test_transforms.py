@@ -0,0 +1,38 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+jax.config.update('jax_enable_x64', True)
+
+from jimgw.transforms import make_default_transform, make_transform_pipeline, make_mass_ratio_transform, make_cosine_transform, make_sine_transform, transform_chains
+
+true_param_trans = jnp.array([30., 0.6, 0.1, -0.2, 400., 0.01, 0.4, np.cos(0.4), 0.3, 1.3, np.sin(-0.5)])
+
+
+def test_default_transform_matches_scatter_updates():
+    pipeline = make_default_transform()
+    assert len(pipeline['sampling_names']) == len(pipeline['physical_names']) == 11
+    x = true_param_trans*(1 + 0.01*jax.random.normal(jax.random.PRNGKey(0), (100, 11)))
+
+    # Same as the posterior of the examples.
+    def convert(theta):
+        q = theta[1]
+        theta = theta.at[1].set(q/(1+q)**2)
+        theta = theta.at[7].set(jnp.arccos(theta[7]))
+        theta = theta.at[10].set(jnp.arcsin(theta[10]))
+        return theta
+
+    y = jax.jit(pipeline['forward'])(x)
+    assert y.shape == x.shape
+    assert np.allclose(y, jax.vmap(convert)(x), rtol=1e-12)
+    assert np.allclose(pipeline['inverse'](y), x, rtol=1e-10)
+
+    chains = transform_chains(pipeline, x.reshape(10, 10, 11))
+    assert chains['eta'].shape == (10, 10)
+    assert np.allclose(chains['dec'].reshape(-1), y[:, 10])
+
+
+def test_log_jacobian_matches_autodiff():
+    pipeline = make_transform_pipeline([make_mass_ratio_transform(), make_cosine_transform(), make_sine_transform()])
+    x = jnp.array([[0.3, 0.2, -0.7], [0.8, -0.9, 0.1]])
+    expected = jax.vmap(lambda x: jnp.linalg.slogdet(jax.jacfwd(pipeline['forward'])(x))[1])(x)
+    assert np.allclose(pipeline['log_jacobian'](x), expected, rtol=1e-12)
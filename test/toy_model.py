@@ -0,0 +1,80 @@
+import numpy as np
+import jax
+import jax.numpy as jnp
+
+jax.config.update('jax_enable_x64', True)
+
+from jimgw.PE.constants import Msun, Mpc
+
+def gen_toy_polar(f, theta, f_ref):
+    """
+    Leading order post-Newtonian waveform with the same parameter layout as ripple's gen_IMRPhenomD_polar.
+    It is only meant to exercise the likelihood machinery in the tests, and is cut off at the ISCO frequency.
+
+    theta = [Mc, eta, chi1, chi2, dist_mpc, tc, phic, inclination]
+    """
+    Mc, eta, dist, tc, phic, iota = theta[0], theta[1], theta[4], theta[5], theta[6], theta[7]
+    M_tot = Mc / eta**(3./5)
+    f_isco = 1./(6**1.5*jnp.pi*M_tot*Msun)
+    f_safe = jnp.where(f > 0, f, f_ref)
+    x = jnp.pi*Mc*Msun*f_safe
+    x_ref = jnp.pi*Mc*Msun*f_ref
+    psi = 2*jnp.pi*f*tc - 2*phic - jnp.pi/4 + 3./128*(x**(-5./3) - x_ref**(-5./3))
+    amp = jnp.sqrt(5./24)*jnp.pi**(-2./3)*(Mc*Msun)**(5./6)*f_safe**(-7./6)/(dist*Mpc)
+    h0 = jnp.where((f > 0) & (f < f_isco), amp*jnp.exp(-1j*psi), 0.)
+    hp = h0*(1+jnp.cos(iota)**2)/2
+    hc = -1j*h0*jnp.cos(iota)
+    return hp, hc
+
+true_param = jnp.array([30., 0.249, 0., 0., 400., 0.01, 0.4, 0.4, 0.3, 1.3, -0.5])
+
+def make_toy_event(seed=0, duration=4, f_sampling=2048, f_min=20., n_det=3, param=true_param):
+    """
+    Simulate Gaussian noise plus signal in n_det detectors with a toy PSD.
+    Returns freqs, data_list, psd_list, detector tensors and vertices, gmst, epoch and f_ref.
+    """
+    from jimgw.PE.detector_preset import get_H1, get_L1, get_V1
+    from jimgw.PE.detector_projection import make_detector_response
+
+    freqs = np.fft.rfftfreq(duration*f_sampling, 1./f_sampling)
+    freqs = freqs[freqs > f_min]
+    df = freqs[1] - freqs[0]
+    gmst = 1.2
+    epoch = duration - 2
+    f_ref = 30.
+    detectors = [get_H1(), get_L1(), get_V1()][:n_det]
+    key = jax.random.PRNGKey(seed)
+    hp, hc = gen_toy_polar(freqs, param.at[5].set(0), f_ref)
+    data_list, psd_list = [], []
+    for i, (tensor, vertex) in enumerate(detectors):
+        psd = 1e-46*((freqs/50.)**-4 + 1 + (freqs/200.)**2)*(1+0.2*i)
+        key, subkey = jax.random.split(key)
+        noise = jax.random.normal(subkey, (2, len(freqs)))*jnp.sqrt(psd/(4*df))
+        signal = make_detector_response(tensor, vertex)(freqs, hp, hc, param[9], param[10], gmst, param[8])
+        signal = signal*jnp.exp(-1j*2*jnp.pi*freqs*(epoch+param[5]))
+        data_list.append(signal + noise[0] + 1j*noise[1])
+        psd_list.append(psd)
+    detector_tensors = jnp.stack([d[0] for d in detectors])
+    detector_vertices = jnp.stack([d[1] for d in detectors])
+    return freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref
+
+def dense_likelihood(params, freqs, data_list, psd_list, detector_tensors, detector_vertices, gmst, epoch, f_ref, earth_rotation=False):
+    """
+    Reference log-likelihood of a stack of detectors, summed over every frequency of the grid with a constant df.
+    The arguments after params are the outputs of make_toy_event. With earth_rotation, the detector response
+    is evaluated at the time to merger of each frequency.
+    """
+    from jimgw.PE.detector_projection import make_stacked_detector_response, make_rotating_detector_response
+    from jimgw.PE.utils import time_to_merger
+
+    df = freqs[1] - freqs[0]
+    hp, hc = gen_toy_polar(freqs, params.at[5].set(0), f_ref)
+    if earth_rotation:
+        detector_response = make_rotating_detector_response(detector_tensors, detector_vertices)
+        h = detector_response(freqs, hp, hc, params[9], params[10], gmst, params[8], time_to_merger(freqs, params[0]))
+    else:
+        detector_response = make_stacked_detector_response(detector_tensors, detector_vertices)
+        h = detector_response(freqs, hp, hc, params[9], params[10], gmst, params[8])
+    h = h*jnp.exp(-1j*2*jnp.pi*freqs*(epoch+params[5]))
+    data, psd = jnp.stack(data_list), jnp.stack(psd_list)
+    return (4*jnp.sum(jnp.conj(h)*data/psd)*df).real - 2*jnp.sum(jnp.abs(h)**2/psd)*df